@@ -0,0 +1,75 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Micro-benchmark of the always-on flight recorder. Times a timed_op-wrapped no-op with the recorder enabled and
+# disabled, so the difference is the per-op cost every collective pays. Needs no GPU and no distributed launch:
+#     python benchmarks/flight_recorder_overhead.py
+
+import argparse
+import timeit
+import sys, os
+
+import torch
+
+COMMS_BENCH_DIR = os.path.join(os.path.dirname(__file__), "../")
+sys.path.append(COMMS_BENCH_DIR)
+
+import mcr_dl.comm as dist
+
+# Budget of the always-on recording, per op
+OVERHEAD_BUDGET_NS = 1000
+
+
+@dist.timed_op
+def noop_all_reduce(tensor, op=None, group=None, async_op=False, prof=False, log_name='all_reduce', debug=None):
+    return None
+
+
+def time_per_call_ns(fn, iterations, repeats):
+    # Best of several repeats, to filter out scheduling noise
+    return min(timeit.repeat(fn, number=iterations, repeat=repeats)) / iterations * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200000, help='Calls per repeat')
+    parser.add_argument("--repeats", type=int, default=7, help='Number of repeats, the fastest one is reported')
+    args = parser.parse_args()
+
+    tensor = torch.ones(1024)
+    group = object()
+    call = lambda: noop_all_reduce(tensor, group=group)
+
+    dist.flight_recorder.enabled = False
+    disabled_ns = time_per_call_ns(call, args.iterations, args.repeats)
+    dist.flight_recorder.enabled = True
+    enabled_ns = time_per_call_ns(call, args.iterations, args.repeats)
+    recorder = dist.flight_recorder
+    direct_ns = time_per_call_ns(lambda: recorder.end(recorder.start('all_reduce', group, tensor)), args.iterations,
+                                 args.repeats)
+
+    overhead_ns = enabled_ns - disabled_ns
+    print(f"{'timed_op, recorder disabled':35s} {disabled_ns:10.1f} ns/op")
+    print(f"{'timed_op, recorder enabled':35s} {enabled_ns:10.1f} ns/op")
+    print(f"{'recorder start + end':35s} {direct_ns:10.1f} ns/op")
+    print(f"{'always-on overhead':35s} {overhead_ns:10.1f} ns/op (budget {OVERHEAD_BUDGET_NS} ns)")
+    return 0 if overhead_ns < OVERHEAD_BUDGET_NS else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Latency and bandwidth of the links between all pairs of ranks, to find bad links and plan rank placement.
+# Pairs are scheduled as a round-robin tournament: every round, each rank is paired with one other rank and all
+# pairs of the round ping-pong concurrently, so the full matrix takes N - 1 rounds instead of N * (N - 1) / 2.
+# With --max-rounds, a seeded random subset of the rounds is measured for large jobs.
+# Runs on CPU with gloo or MPI as well, e.g.
+#     torchrun --nproc_per_node 4 benchmarks/link_matrix.py --dist mcr_dl --backend gloo
+# Writes <prefix>_latency_us and <prefix>_bw_gbps matrices as .npy and .csv, NaN where not measured.
+
+import numpy as np
+import torch
+import sys, os, time, random
+
+COMMS_BENCH_DIR = os.path.join(os.path.dirname(__file__), "../")
+sys.path.append(COMMS_BENCH_DIR)
+
+from utils import *
+from constants import *
+
+# Links further than this many (normal-scaled) MADs from the median link are reported
+OUTLIER_MADS = 3.0
+
+
+def round_robin_rounds(world_size):
+    """Returns a list of rounds, each a list of disjoint (low rank, high rank) pairs. Every pair occurs once."""
+    # Circle method: the first player stays, the others rotate. An odd number of ranks gets a bye each round.
+    players = list(range(world_size)) + ([None] if world_size % 2 else [])
+    n = len(players)
+    rounds = []
+    for _ in range(n - 1):
+        pairs = []
+        for i in range(n // 2):
+            a, b = players[i], players[n - 1 - i]
+            if a is not None and b is not None:
+                pairs.append((min(a, b), max(a, b)))
+        rounds.append(pairs)
+        players = [players[0], players[-1]] + players[1:-1]
+    return rounds
+
+
+def ping_pong(dist, tensor, peer, first, iterations):
+    """Round trips of ``tensor`` with ``peer``, returns the average time of one round trip in seconds."""
+    start = time.perf_counter()
+    for i in range(iterations):
+        if first:
+            dist.send(tensor, peer)
+            dist.recv(tensor, src=peer)
+        else:
+            dist.recv(tensor, src=peer)
+            dist.send(tensor, peer)
+    get_accelerator().synchronize()
+    return (time.perf_counter() - start) / iterations
+
+
+def measure_link(dist, small, large, peer, first, args):
+    for i in range(args.warmups):
+        ping_pong(dist, small, peer, first, 1)
+        ping_pong(dist, large, peer, first, 1)
+    latency = ping_pong(dist, small, peer, first, args.trials) / 2
+    # Like pt2pt.py, bandwidth is the message size over its one-way time
+    one_way = ping_pong(dist, large, peer, first, max(1, args.trials // 10)) / 2
+    bw = large.element_size() * large.nelement() / one_way
+    return latency * 1e6, bw * 8 / 1e9
+
+
+def find_outliers(matrix, higher_is_worse):
+    """Returns (rank a, rank b, value) of the outlier links of a symmetric matrix, worst first."""
+    upper = np.triu(np.ones_like(matrix, dtype=bool), k=1) & ~np.isnan(matrix)
+    values = matrix[upper]
+    if values.size < 3:
+        return []
+    median = np.median(values)
+    mad = np.median(np.abs(values - median)) * 1.4826
+    if mad == 0:
+        return []
+    deviation = (matrix - median) / mad if higher_is_worse else (median - matrix) / mad
+    outliers = [(a, b, matrix[a, b]) for a, b in zip(*np.nonzero(upper & (deviation > OUTLIER_MADS)))]
+    return sorted(outliers, key=lambda o: o[2], reverse=higher_is_worse)
+
+
+def print_matrix_summary(name, unit, matrix, higher_is_worse):
+    values = matrix[~np.isnan(matrix)]
+    if values.size == 0:
+        return
+    print(f"{name:15s} min {values.min():10.3f} {unit}   median {np.median(values):10.3f} {unit}   "
+          f"max {values.max():10.3f} {unit}")
+    outliers = find_outliers(matrix, higher_is_worse)
+    for a, b, value in outliers[:10]:
+        print(f"    outlier link {a:5d} <-> {b:5d}: {value:10.3f} {unit}")
+    if len(outliers) > 10:
+        print(f"    ... and {len(outliers) - 10} more")
+    # A rank whose median link is an outlier likely has a bad NIC or sits on a bad switch port
+    measured = ~np.isnan(matrix).all(axis=1)
+    per_rank = np.full(len(matrix), np.nan)
+    per_rank[measured] = np.nanmedian(matrix[measured], axis=1)
+    worst = np.nanargmax(per_rank) if higher_is_worse else np.nanargmin(per_rank)
+    print(f"    worst rank {worst}: median link {per_rank[worst]:.3f} {unit}")
+
+
+def run_link_matrix(args):
+    dist = mcr_dl.get_distributed_engine()
+    rank = dist.get_rank()
+    world_size = dist.get_world_size()
+    if world_size < 2:
+        print_rank_0("link_matrix.py needs at least 2 ranks")
+        return
+    if args.backend == 'nccl':
+        device = get_accelerator().device_name(int(os.environ.get('LOCAL_RANK', 0)))
+    else:
+        device = 'cpu'
+    small = torch.ones(max(1, args.latency_bytes // 4), dtype=torch.float32, device=device)
+    large = torch.ones(2**args.maxsize // 4, dtype=torch.float32, device=device)
+
+    rounds = round_robin_rounds(world_size)
+    if args.max_rounds and args.max_rounds < len(rounds):
+        # Same seed on all ranks, so they agree on the sampled rounds
+        rounds = random.Random(args.seed).sample(rounds, args.max_rounds)
+    print_rank_0(f"\n---- Link matrix of {world_size} ranks, {len(rounds)} rounds, latency with "
+                 f"{convert_size(small.nelement() * 4)}, bandwidth with {convert_size(large.nelement() * 4)} ----")
+
+    # Every pair is measured by its lower rank, the matrices are summed up over all ranks afterwards
+    results = torch.zeros(2, world_size, world_size, dtype=torch.float64)
+    for pairs in rounds:
+        sync_all()
+        for a, b in pairs:
+            if rank in (a, b):
+                latency, bw = measure_link(dist, small, large, b if rank == a else a, rank == a, args)
+                if rank == a:
+                    results[0, a, b] = results[0, b, a] = latency
+                    results[1, a, b] = results[1, b, a] = bw
+    sync_all()
+    results = results.to(device)
+    dist.all_reduce(results)
+    results = results.cpu().numpy()
+    results[results == 0] = np.nan
+    latency_us, bw_gbps = results[0], results[1]
+
+    if rank == 0:
+        for suffix, matrix in [('latency_us', latency_us), ('bw_gbps', bw_gbps)]:
+            np.save(f'{args.output_prefix}_{suffix}.npy', matrix)
+            np.savetxt(f'{args.output_prefix}_{suffix}.csv', matrix, delimiter=',', fmt='%.3f')
+        print_matrix_summary('Latency', 'us', latency_us, higher_is_worse=True)
+        print_matrix_summary('Bandwidth', 'Gbps', bw_gbps, higher_is_worse=False)
+        print(f"Matrices written to {args.output_prefix}_latency_us.npy/.csv and {args.output_prefix}_bw_gbps.npy/.csv")
+    return latency_us, bw_gbps
+
+
+if __name__ == "__main__":
+    parser = benchmark_parser()
+    parser.add_argument("--latency-bytes", type=int, default=8, help='Message size of the latency measurement')
+    parser.add_argument("--max-rounds",
+                        type=int,
+                        default=0,
+                        help='Measure a random subset of this many rounds, 0 measures all pairs')
+    parser.add_argument("--seed", type=int, default=0, help='Seed of the sampled rounds')
+    parser.add_argument("--output-prefix", type=str, default='link_matrix', help='Prefix of the output files')
+    parser.set_defaults(maxsize=22)
+    args = parser.parse_args()
+    mcr_dl.init_processes(args.dist, args.backend)
+    run_link_matrix(args)
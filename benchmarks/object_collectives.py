@@ -0,0 +1,96 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Compares mcr_dl.broadcast_object_list / all_gather_object (pickle protocol 5, out-of-band buffers) against the
+# torch.distributed implementations, which pickle everything in-band, on a dict of NumPy arrays.
+# The torch columns are only filled in when torch.distributed is initialized (MCR-DL with the torch backends).
+
+import numpy as np
+import torch
+import sys, os, time
+
+COMMS_BENCH_DIR = os.path.join(os.path.dirname(__file__), "../")
+sys.path.append(COMMS_BENCH_DIR)
+
+from utils import *
+from constants import *
+
+
+def make_payload(args):
+    dist = mcr_dl.get_distributed_engine()
+    numel = int(args.payload_mb * 2**20) // args.num_arrays // 4
+    return {f'array_{i}': np.full(numel, dist.get_rank(), dtype=np.float32) for i in range(args.num_arrays)}
+
+
+def time_op(fn, args):
+    for i in range(args.warmups):
+        fn()
+    sync_all()
+    start = time.perf_counter()
+    for i in range(args.trials):
+        fn()
+    sync_all()
+    return (time.perf_counter() - start) / args.trials
+
+
+def run_object_collectives(args):
+    dist = mcr_dl.get_distributed_engine()
+    payload = make_payload(args)
+    use_torch = torch.distributed.is_available() and torch.distributed.is_initialized()
+    if use_torch and args.backend == 'nccl':
+        torch.cuda.set_device(get_accelerator().current_device())
+
+    def mcr_dl_broadcast():
+        objects = [payload] if dist.get_rank() == 0 else [None]
+        mcr_dl.broadcast_object_list(objects, src=0)
+
+    def torch_broadcast():
+        objects = [payload] if dist.get_rank() == 0 else [None]
+        torch.distributed.broadcast_object_list(objects, src=0)
+
+    def mcr_dl_all_gather():
+        mcr_dl.all_gather_object([], payload)
+
+    def torch_all_gather():
+        torch.distributed.all_gather_object([None] * dist.get_world_size(), payload)
+
+    print_rank_0(f"\n---- Object collectives, {args.num_arrays} arrays / {convert_size(args.payload_mb * 2**20)} per rank "
+                 f"on {dist.get_world_size()} ranks ----")
+    print_rank_0(f"{'Op':25s} {'mcr_dl':20s} {'torch':20s} {'Speedup':10s}")
+    for name, mcr_dl_fn, torch_fn in [('broadcast_object_list', mcr_dl_broadcast, torch_broadcast),
+                                      ('all_gather_object', mcr_dl_all_gather, torch_all_gather)]:
+        mcr_dl_time = time_op(mcr_dl_fn, args)
+        mcr_dl_str = f'{mcr_dl_time * 1e3:.3f} ms'
+        torch_str, speedup_str = 'n/a', 'n/a'
+        if use_torch:
+            torch_time = time_op(torch_fn, args)
+            torch_str = f'{torch_time * 1e3:.3f} ms'
+            speedup_str = f'{torch_time / mcr_dl_time:.2f}x'
+        print_rank_0(f"{name:25s} {mcr_dl_str:20s} {torch_str:20s} {speedup_str:10s}")
+
+
+if __name__ == "__main__":
+    parser = benchmark_parser()
+    parser.add_argument("--payload-mb", type=float, default=100, help='Size of the object on each rank, in MB')
+    parser.add_argument("--num-arrays", type=int, default=10, help='Number of NumPy arrays the payload is split into')
+    args = parser.parse_args()
+    if args.dist != 'mcr_dl':
+        print("object_collectives.py benchmarks mcr_dl against torch.distributed, please run it with --dist mcr_dl")
+        exit(0)
+    mcr_dl.init_processes(args.dist, args.backend)
+    run_object_collectives(args)
@@ -0,0 +1,75 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Overhead of the comms logger as a function of its sampling rate. Every profiled all_reduce is made blocking
+# (device sync, plus a barrier with MPI), so the cost of profiling falls with the fraction of sampled calls.
+#     mpirun -np 2 python benchmarks/sampling_overhead.py --dist mcr_dl --backend nccl
+
+import torch
+import sys, os, time
+
+COMMS_BENCH_DIR = os.path.join(os.path.dirname(__file__), "../")
+sys.path.append(COMMS_BENCH_DIR)
+
+from utils import *
+from constants import *
+
+
+def time_all_reduce(tensor, args):
+    for i in range(args.warmups):
+        mcr_dl.all_reduce(tensor)
+    sync_all()
+    start = time.perf_counter()
+    for i in range(args.trials):
+        mcr_dl.all_reduce(tensor)
+    sync_all()
+    return (time.perf_counter() - start) / args.trials
+
+
+def run_sampling_overhead(args):
+    dist = mcr_dl.get_distributed_engine()
+    world_size = dist.get_world_size()
+    tensor = torch.ones(2**args.maxsize // 4, dtype=torch.float32, device=mcr_dl.get_comm_device())
+
+    mcr_dl.configure(enabled=False)
+    baseline = time_all_reduce(tensor, args)
+    print_rank_0(f"\n---- Comms logger overhead, all_reduce of {convert_size(tensor.numel() * 4)} on {world_size} ranks ----")
+    print_rank_0(f"{'Sample rate':20s} {'Time/op':20s} {'Overhead':20s}")
+    print_rank_0(f"{'logger disabled':20s} {baseline * 1e6:10.2f} us")
+    for sample_rate in args.sample_rates:
+        mcr_dl.configure(enabled=True, prof_all=True, sample_rate=sample_rate)
+        elapsed = time_all_reduce(tensor, args)
+        overhead = (elapsed - baseline) / baseline * 100
+        print_rank_0(f"{f'1 in {sample_rate}':20s} {elapsed * 1e6:10.2f} us {'':9s}{overhead:8.2f} %")
+    mcr_dl.configure(enabled=False, sample_rate=1)
+
+
+if __name__ == "__main__":
+    parser = benchmark_parser()
+    parser.add_argument("--sample-rates",
+                        type=int,
+                        nargs='+',
+                        default=[1, 10, 100, 1000],
+                        help='Sampling rates of the comms logger to measure')
+    parser.set_defaults(maxsize=16, trials=1000)
+    args = parser.parse_args()
+    if args.dist != 'mcr_dl':
+        print("sampling_overhead.py measures the MCR-DL comms logger, please run it with --dist mcr_dl")
+        exit(0)
+    mcr_dl.init_processes(args.dist, args.backend)
+    run_sampling_overhead(args)
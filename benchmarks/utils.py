@@ -114,6 +114,9 @@ def max_numel(comm_op, dtype, mem_factor, local_rank, args):
     dist = mcr_dl.get_distributed_engine()
     dtype_size = _element_size(dtype)
     max_memory_per_gpu = get_accelerator().total_memory(local_rank) * mem_factor
+    if args.dist == 'mcr_dl' and mcr_dl.comm.comms_memory.budget is not None:
+        # Benchmark buffers count against the comm memory budget too
+        max_memory_per_gpu = min(max_memory_per_gpu, mcr_dl.comm.comms_memory.budget)
     if comm_op == 'all_reduce' or comm_op == 'pt2pt' or comm_op == 'broadcast':
         elements_per_gpu = int(max_memory_per_gpu // dtype_size)
     elif comm_op == 'all_gather':
@@ -174,7 +177,7 @@ def benchmark_parser():
     parser.add_argument("--backend",
                         type=str,
                         default=DEFAULT_BACKEND,
-                        choices=['nccl', 'mpi'],
+                        choices=['nccl', 'mpi', 'gloo'],
                         help='Communication library to use')
     parser.add_argument("--dist",
                         type=str,
@@ -29,7 +29,7 @@ def init_torch_distributed(backend):
     import torch.distributed as dist
     if backend == 'nccl':
         mpi_discovery()
-    elif backend == 'mpi':
+    elif backend == 'mpi' or backend == 'gloo':
         set_mpi_dist_environemnt()
     dist.init_process_group(backend=backend)
     local_rank = int(os.environ['LOCAL_RANK'])
@@ -54,6 +54,22 @@ class Backend(object):
         # create a new pg and add it to pg list
         pass
 
+    def new_subgroups(self, ranks_list):
+        # create every disjoint group in ranks_list and return the one this rank belongs to.
+        # Backends that can split a communicator in one step should override this.
+        rank = self.get_rank()
+        my_group = None
+        for ranks in ranks_list:
+            group = self.new_group(ranks)
+            if rank in ranks:
+                my_group = group
+        return my_group
+
+    def scratch_bytes(self, op_name, tensor, group=None):
+        # Bytes of temporary buffers the backend allocates internally to run op_name on tensor. Used for comm
+        # memory accounting, see mcr_dl/utils/comms_memory.py
+        return 0
+
     def init_process_group(self):
         # subclasses will initialize them fully
         # - initialize a default world process group and add it to pg list
@@ -41,6 +41,13 @@ from datetime import timedelta
 
 from mcr_dl import utils
 from mcr_dl.utils.comms_logging import CommsLogger
+from mcr_dl.utils.flight_recording import FlightRecorder, get_op_arg_positions, P2P_OPS
+from mcr_dl.utils.comms_tracing import CommsTracer, current_stream_id
+from mcr_dl.utils.comms_metrics import CommsMetrics, MetricsExporter
+from mcr_dl.utils.comms_sink import CommsSink
+from mcr_dl.utils.comms_anomaly import AnomalyDetector
+from mcr_dl.utils.comms_memory import CommsMemory
+from mcr_dl.utils.profiler_ranges import profiler_active, op_range
 from mcr_dl.utils import timer, get_caller_func
 
 from .constants import TORCH_DISTRIBUTED_DEFAULT_PORT, default_pg_timeout
@@ -50,6 +57,9 @@ from .cuda_accelerator import get_accelerator
 from .nccl import NCCLBackend
 from .mpi import MPIBackend
 from .torch import TorchBackend
+from .topology import Topology, init_topology, get_topology
+from .device_mesh import DeviceMesh
+from .ring_order import Ring, new_ring, bottleneck_ring
 
 # Current mcr-dl backend (cdb) global object for simple access by client code
 cdb = None
@@ -60,6 +70,28 @@ timer_summary = {}
 
 comms_logger = CommsLogger()
 
+# Always-on record of the most recent ops, see mcr_dl.utils.flight_recording
+flight_recorder = FlightRecorder()
+
+# Timeline of profiled ops while tracing is on, see mcr_dl.utils.comms_tracing
+comms_tracer = CommsTracer()
+
+# Staging and scratch memory of communication, see mcr_dl.utils.comms_memory
+comms_memory = CommsMemory()
+
+# Whether ops open record_function ranges while a torch profiler is recording, see configure()
+record_profiler_ranges = PROFILER_RANGES_DEFAULT
+
+# HTTP endpoint serving live comms logger statistics, see start_metrics_exporter()
+metrics_exporter = None
+
+# Groups created through new_subgroups(), keyed by the tuple of global ranks in the group
+subgroup_cache = {}
+
+# Rings that reduce_scatter_tensor, all_gather_into_tensor and all_reduce of a group (None for the world) are routed
+# through, see use_ring_order()
+ring_collectives = {}
+
 # Maintain objects of all initialized ds backends and assign them using the API functions in this file
 nccl_backend = None
 mpi_backend = None
@@ -77,6 +109,21 @@ class ProcessGroup():
         self.comm_id = comm_id
         self.size = len(ranks)
 
+def get_comm_device():
+    '''
+    Returns the device that tensors handed to the current backend must live on. Used by helpers that exchange
+    small amounts of metadata (e.g. topology discovery) so they work with every MCR-DL backend.
+    '''
+    global cdb
+    assert cdb is not None and cdb.is_initialized(
+    ), 'MCR-DL backend not set, please initialize it using init_process_group()'
+    if cdb.name == MPI_BACKEND:
+        return 'cpu'
+    if cdb.name == 'torch' and cdb.get_backend() in [GLOO_BACKEND, MPI_BACKEND]:
+        return 'cpu'
+    return get_accelerator().current_device_name()
+
+
 def _configure_using_config_file(config):
     if config.comms_logger_enabled:
         comms_logger.configure(config)
@@ -89,6 +136,11 @@ def configure(
     prof_ops=None,
     verbose=None,
     debug=None,
+    profiler_ranges=None,
+    sample_rate=None,
+    sample_steps=None,
+    memory_accounting=None,
+    memory_budget=None,
 ):
 
     if mcr_dl_config is not None:
@@ -109,39 +161,91 @@ def configure(
     if debug is not None:
         comms_logger.debug = debug
 
+    if sample_rate is not None:
+        comms_logger.sample_rate = sample_rate
+
+    if sample_steps is not None:
+        comms_logger.sample_steps = sample_steps
+
+    if profiler_ranges is not None:
+        global record_profiler_ranges
+        record_profiler_ranges = profiler_ranges
+
+    if memory_accounting is not None:
+        comms_memory.enabled = memory_accounting
+
+    if memory_budget is not None:
+        # A budget of 0 removes the limit. Enforcing one needs the accounting
+        comms_memory.budget = memory_budget or None
+        comms_memory.enabled = comms_memory.enabled or memory_budget > 0
+
 # Logging wrapper for timing ops
 def timed_op(func):
+    # Resolved once here, so the always-on flight recorder does not inspect the signature on every call
+    op_name = func.__name__
+    tensor_name, tensor_position, group_position = get_op_arg_positions(func)
+    collective = op_name not in P2P_OPS
+    default_log_name = get_default_args(func).get('log_name', op_name)
 
     def log_wrapper(*args, **kwargs):
+        seq = None
+        if flight_recorder.enabled:
+            seq = flight_recorder.start(
+                op_name, args[group_position] if len(args) > group_position else kwargs.get('group'),
+                args[tensor_position] if len(args) > tensor_position else kwargs.get(tensor_name), collective)
+        record_function = None
+        if record_profiler_ranges and profiler_active():
+            record_function = op_range(
+                kwargs.get('log_name', default_log_name),
+                args[tensor_position] if len(args) > tensor_position else kwargs.get(tensor_name),
+                args[group_position] if len(args) > group_position else kwargs.get('group'))
+            record_function.__enter__()
         # Add enabled flag so that overhead to each comm op is two if conditions at most
+        weight = 0
         if comms_logger.enabled:
             if ('prof' in kwargs
                     and kwargs['prof']) or comms_logger.prof_all or ('log_name' in kwargs
                                                                      and kwargs['log_name'] in comms_logger.prof_ops):
+                # Decided before the op, so a sampled call is made blocking on all ranks or on none
+                weight = comms_logger.sample_weight(
+                    op_name, args[tensor_position] if len(args) > tensor_position else kwargs.get(tensor_name))
+            if weight:
                 # Need func args for their defaults
                 func_args = get_default_args(func)
                 func_args.update(kwargs)
                 msg_size = get_msg_size_from_args(func, *args, **kwargs)
                 log_name = get_debug_log_name(func_args, comms_logger.debug)
                 timers(log_name).start()
+                if comms_tracer.enabled:
+                    trace_begin = comms_tracer.now()
         # Return the op, then stop the op's timer
         try:
             return func(*args, **kwargs)
+        except BaseException:
+            if seq is not None:
+                flight_recorder.fail(seq)
+            raise
         finally:
-            if comms_logger.enabled:
+            if record_function is not None:
+                record_function.__exit__(None, None, None)
+            if seq is not None:
+                flight_recorder.end(seq)
+            if weight:
                 # Need to make op blocking for accurate logging
                 get_accelerator().synchronize()
                 # If we're using MPI, we can't simply sync the stream
                 if cdb.using_mpi:
                     cdb.barrier()
-                if ('prof' in kwargs and kwargs['prof']) or comms_logger.prof_all or (
-                        'log_name' in kwargs and kwargs['log_name'] in comms_logger.prof_ops):
-                    log_name = get_debug_log_name(func_args, comms_logger.debug)
-                    raw_name = func.__name__
-                    timers(log_name).stop()
-                    # need temp var since 'elapsed' resets events
-                    time_elapsed = timers(log_name).elapsed(reset=False)
-                    comms_logger.append(raw_name, log_name, time_elapsed, msg_size)
+                log_name = get_debug_log_name(func_args, comms_logger.debug)
+                raw_name = func.__name__
+                timers(log_name).stop()
+                # need temp var since 'elapsed' resets events
+                time_elapsed = timers(log_name).elapsed(reset=False)
+                group = args[group_position] if len(args) > group_position else kwargs.get('group')
+                comms_logger.append(raw_name, log_name, time_elapsed, msg_size, group=group, weight=weight)
+                if comms_tracer.enabled:
+                    comms_tracer.record(raw_name, group, msg_size, trace_begin, comms_tracer.now(),
+                                        current_stream_id())
 
     return log_wrapper
 
@@ -190,6 +294,30 @@ def new_group(ranks):
     return cdb.new_group(ranks)
 
 
+def new_subgroups(ranks_list):
+    '''
+    Create the disjoint groups in ``ranks_list`` with a single backend call and return the one the calling rank
+    belongs to (None if it is in none of them). Must be called by all ranks with the same ``ranks_list``.
+    Groups are cached by their ranks, so repeated requests for the same group reuse its communicator.
+    '''
+    global cdb
+    assert cdb is not None and cdb.is_initialized(
+    ), 'MCR-DL backend not set, please initialize it using init_process_group()'
+    rank = cdb.get_rank()
+    # Cache entries exist for every group of a call (None for groups this rank is not in), so all ranks
+    # agree on which groups are still missing
+    missing = [ranks for ranks in ranks_list if tuple(ranks) not in subgroup_cache]
+    if missing:
+        if len(missing) == 1 and len(missing[0]) == cdb.get_world_size():
+            group = cdb.get_world_group()
+        else:
+            group = cdb.new_subgroups(missing)
+        for ranks in missing:
+            subgroup_cache[tuple(ranks)] = group if rank in ranks else None
+    key = next((tuple(ranks) for ranks in ranks_list if rank in ranks), None)
+    return subgroup_cache.get(key)
+
+
 def is_available() -> bool:
 
     # Returns ``True`` if the mcr-dl comm package is available.
@@ -238,9 +366,138 @@ def all_gather(tensor_list,
                log_name='all_gather',
                debug=get_caller_func()):
     global cdb
+    if comms_memory.enabled:
+        return _within_memory_budget(
+            'all_gather', tensor, group, async_op, lambda chunk: cdb.all_gather(
+                tensor_list=tensor_list if chunk is None else [t.view(-1)[chunk] for t in tensor_list],
+                tensor=tensor if chunk is None else tensor.view(-1)[chunk],
+                group=group,
+                async_op=async_op))
     return cdb.all_gather(tensor_list=tensor_list, tensor=tensor, group=group, async_op=async_op)
 
 
+def _within_memory_budget(op_name, tensor, group, async_op, run):
+    '''
+    Runs an op through ``run(chunk)`` while accounting the scratch memory the backend allocates for it. ``chunk`` is
+    None for the whole tensor. When the scratch memory doesn't fit in the comm memory budget, the op is run on
+    slices ``chunk`` of the flattened tensor instead. Async and non-contiguous ops are never split.
+    '''
+    scratch = cdb.scratch_bytes(op_name, tensor, group)
+    if not scratch:
+        return run(None)
+    numel = tensor.numel()
+    chunk_numel = comms_memory.chunk_numel(scratch, numel)
+    if chunk_numel == numel or async_op or not tensor.is_contiguous():
+        with comms_memory.reserve(op_name, group, scratch):
+            return run(None)
+    comms_memory.chunked_ops += 1
+    with comms_memory.reserve(op_name, group, scratch * chunk_numel // numel):
+        for begin in range(0, numel, chunk_numel):
+            run(slice(begin, begin + chunk_numel))
+
+
+def _group_global_rank(group, group_rank):
+    return group_rank if group is None else get_global_rank(group, group_rank)
+
+
+def _recv_buffers(sizes, device, op_name, group):
+    buffers = [torch.empty(size, dtype=torch.uint8, device=device) for size in sizes]
+    if comms_memory.enabled:
+        for buffer in buffers:
+            comms_memory.track(buffer, op_name, group)
+    return buffers
+
+
+def broadcast_object_list(object_list, src=0, group=None, device=None):
+    """
+    Broadcasts picklable objects in ``object_list`` from global rank ``src`` to the whole group, in place.
+
+    Objects are serialized with pickle protocol 5. Buffers of at least OBJECT_OOB_THRESHOLD bytes (NumPy arrays,
+    tensors, ...) are not copied into the pickle stream but broadcast as separate tensors straight from the memory
+    they live in, so only a small header is pickled.
+
+    Args:
+        object_list (list): objects to broadcast. On non-src ranks it must have the same length and is overwritten.
+        src (int): global rank of the source
+        group (ProcessGroup, optional): group to work on
+        device (torch.device, optional): device to stage the header and buffers on. Defaults to get_comm_device().
+    """
+    from mcr_dl.utils.serialization import serialize_object, parse_header, deserialize_object
+
+    device = get_comm_device() if device is None else device
+    is_src = get_rank() == src
+    if is_src:
+        header, buffers = serialize_object(object_list, OBJECT_OOB_THRESHOLD)
+        header_size = torch.tensor([len(header)], dtype=torch.int64, device=device)
+    else:
+        header_size = torch.empty(1, dtype=torch.int64, device=device)
+    broadcast(header_size, src=src, group=group)
+
+    if is_src:
+        header_tensor = torch.frombuffer(bytearray(header), dtype=torch.uint8).to(device)
+    else:
+        header_tensor = torch.empty(header_size.item(), dtype=torch.uint8, device=device)
+    broadcast(header_tensor, src=src, group=group)
+    if is_src:
+        buffers = [buffer.to(device) for buffer in buffers]
+    else:
+        payload, sizes, pickle_buffer_ids = parse_header(header_tensor.cpu().numpy().tobytes())
+        buffers = _recv_buffers(sizes, device, 'broadcast_object_list', group)
+
+    for buffer in buffers:
+        broadcast(buffer, src=src, group=group)
+
+    if not is_src:
+        object_list[:] = deserialize_object(payload, buffers, pickle_buffer_ids)
+
+
+def all_gather_object(object_list, obj, group=None, device=None):
+    """
+    Gathers picklable objects from the whole group into ``object_list``.
+
+    The header sizes and out-of-band buffer counts of all ranks are exchanged in a single all_gather, the padded
+    headers in a second one, and every out-of-band buffer is then broadcast from its owner without being pickled.
+    See broadcast_object_list() for the serialization scheme.
+
+    Args:
+        object_list (list): output list, resized to the group size. The calling rank's entry is ``obj`` itself.
+        obj: picklable object to contribute from the calling rank
+        group (ProcessGroup, optional): group to work on
+        device (torch.device, optional): device to stage the headers and buffers on. Defaults to get_comm_device().
+    """
+    from mcr_dl.utils.serialization import serialize_object, parse_header, deserialize_object
+
+    device = get_comm_device() if device is None else device
+    world_size = get_world_size(group)
+    group_rank = get_rank(group)
+    header, buffers = serialize_object(obj, OBJECT_OOB_THRESHOLD)
+
+    local_sizes = torch.tensor([len(header), len(buffers)], dtype=torch.int64, device=device)
+    all_sizes = torch.empty(world_size * 2, dtype=torch.int64, device=device)
+    allgather_fn(all_sizes, local_sizes, group=group)
+    header_sizes = all_sizes.view(world_size, 2)[:, 0].tolist()
+    max_header_size = max(header_sizes)
+
+    local_header = torch.zeros(max_header_size, dtype=torch.uint8, device=device)
+    local_header[:len(header)] = torch.frombuffer(bytearray(header), dtype=torch.uint8)
+    all_headers = torch.empty(world_size * max_header_size, dtype=torch.uint8, device=device)
+    allgather_fn(all_headers, local_header, group=group)
+    all_headers = all_headers.view(world_size, max_header_size).cpu().numpy()
+
+    object_list[:] = [None] * world_size
+    for r in range(world_size):
+        if r == group_rank:
+            object_list[r] = obj
+            for buffer in buffers:
+                broadcast(buffer.to(device), src=_group_global_rank(group, r), group=group)
+            continue
+        payload, sizes, pickle_buffer_ids = parse_header(all_headers[r, :header_sizes[r]].tobytes())
+        recv_buffers = _recv_buffers(sizes, device, 'all_gather_object', group)
+        for buffer in recv_buffers:
+            broadcast(buffer, src=_group_global_rank(group, r), group=group)
+        object_list[r] = deserialize_object(payload, recv_buffers, pickle_buffer_ids)
+
+
 def has_reduce_scatter_tensor():
     global cdb
     assert cdb is not None and cdb.is_initialized(
@@ -291,6 +548,10 @@ def reduce_scatter_tensor(output_tensor,
                           log_name='reduce_scatter_tensor',
                           debug=get_caller_func()):
     global cdb
+    if ring_collectives and not async_op:
+        ring = ring_collectives.get(group)
+        if ring is not None and ring.supports(op):
+            return ring.reduce_scatter(output_tensor, tensor, op)
     return cdb.reduce_scatter_tensor(output_tensor=output_tensor,
                                      input_tensor=tensor,
                                      op=op,
@@ -307,6 +568,10 @@ def all_gather_into_tensor(output_tensor,
                            log_name='all_gather_into_tensor',
                            debug=get_caller_func()):
     global cdb
+    if ring_collectives and not async_op:
+        ring = ring_collectives.get(group)
+        if ring is not None:
+            return ring.all_gather(output_tensor, tensor)
     return cdb.all_gather_into_tensor(output_tensor=output_tensor, input_tensor=tensor, group=group, async_op=async_op)
 
 
@@ -431,11 +696,163 @@ def log_summary(show_straggler=False):
     barrier(log_name='log_summary_barrier')
     if cdb.get_rank() == 0:
         comms_logger.log_all(print_log=True, show_straggler=show_straggler)
+        if comms_memory.enabled:
+            print('\n'.join(comms_memory.summary()))
     else:
         comms_logger.log_all(print_log=False, show_straggler=show_straggler)
     barrier(log_name='log_summary_barrier')
 
 
+def start_comms_trace(trace_dir=COMMS_TRACE_DIR):
+    '''
+    Start recording a timeline of the profiled ops, which also enables the comms logger. Must be called
+    collectively, since the clock offsets of the ranks are measured first.
+    '''
+    configure(enabled=True)
+    comms_tracer.start(trace_dir)
+
+
+def export_comms_trace(blocking=True):
+    '''
+    Write the timeline recorded so far to <trace_dir>/trace_rank<rank>.json on the trace writer thread, and return
+    the path. Must be called collectively. Tracing continues afterwards.
+    '''
+    return comms_tracer.export(blocking=blocking)
+
+
+def stop_comms_trace():
+    '''Export the timeline and stop tracing. Must be called collectively.'''
+    path = comms_tracer.export()
+    comms_tracer.stop()
+    return path
+
+
+def start_metrics_exporter(port=COMMS_METRICS_PORT, addr=COMMS_METRICS_ADDR, aggregate=False):
+    '''
+    Serve live statistics of the profiled ops in the Prometheus text format at http://<addr>:<port>/metrics, which
+    also enables the comms logger. Every rank serves its own statistics on port + local rank. With ``aggregate``,
+    only rank 0 serves, including the statistics of all ranks as of the last sync_comms_metrics().
+    Returns the port served on, or None on ranks that don't serve.
+    '''
+    global metrics_exporter
+    if metrics_exporter is not None:
+        return metrics_exporter.port
+    configure(enabled=True)
+    if comms_logger.metrics is None:
+        comms_logger.metrics = CommsMetrics()
+    rank = get_rank()
+    if aggregate and rank != 0:
+        return None
+    if not aggregate and port != 0:
+        port += get_local_rank()
+    metrics_exporter = MetricsExporter(comms_logger.metrics, rank, port=port, addr=addr, aggregate=aggregate)
+    return metrics_exporter.port
+
+
+def sync_comms_metrics():
+    '''
+    Gather the statistics of all ranks and update the straggler time per group. Must be called collectively,
+    e.g. every few hundred steps. The exchange itself is not profiled.
+    '''
+    if comms_logger.metrics is None:
+        return
+    enabled, comms_logger.enabled = comms_logger.enabled, False
+    try:
+        comms_logger.metrics.sync()
+    finally:
+        comms_logger.enabled = enabled
+
+
+def stop_metrics_exporter():
+    global metrics_exporter
+    if metrics_exporter is not None:
+        metrics_exporter.stop()
+        metrics_exporter = None
+
+
+def start_comms_sink(log_dir=COMMS_SINK_DIR,
+                     format=COMMS_SINK_FORMAT,
+                     interval=None,
+                     max_bytes=COMMS_SINK_MAX_BYTES,
+                     compress=False):
+    '''
+    Write a record of every profiled op, or with ``interval`` the averages over intervals of that many seconds, to
+    <log_dir>/comms_rank<rank>-<segment>.<format>[.gz], which also enables the comms logger. Records are written in
+    batches by a background thread. Read them back with mcr_dl.utils.comms_sink.load_comms_log().
+    '''
+    stop_comms_sink()
+    configure(enabled=True)
+    sink = CommsSink(log_dir, format=format, interval=interval, max_bytes=max_bytes, compress=compress)
+    sink.start()
+    comms_logger.sink = sink
+
+
+def set_comms_step(step):
+    '''
+    Set the training step of the following ops, which is stored in the comms log records and drives step sampling
+    (configure(sample_steps=...)). Must be called with the same step on all ranks.
+    '''
+    comms_logger.step = step
+    if comms_logger.sink is not None:
+        comms_logger.sink.step = step
+    if comms_logger.detector is not None:
+        # The periodic slow rank check is a collective of its own, which is not profiled
+        enabled, comms_logger.enabled = comms_logger.enabled, False
+        try:
+            comms_logger.detector.set_step(step)
+        finally:
+            comms_logger.enabled = enabled
+
+
+def stop_comms_sink():
+    '''Write the pending comms log records and close the log.'''
+    sink, comms_logger.sink = comms_logger.sink, None
+    if sink is not None:
+        sink.stop()
+
+
+def start_anomaly_detection(k=COMMS_ANOMALY_K, check_interval=COMMS_ANOMALY_CHECK_STEPS, callback=None):
+    '''
+    Flag profiled ops slower than their rolling baseline by more than k MADs, and every check_interval steps
+    (see set_comms_step()) report a rank that keeps the others waiting. Also enables the comms logger. Reports are
+    logged and passed to ``callback`` as dicts. Returns the AnomalyDetector.
+    '''
+    configure(enabled=True)
+    if comms_logger.detector is None:
+        comms_logger.detector = AnomalyDetector(k=k, check_interval=check_interval)
+    if callback is not None:
+        comms_logger.detector.add_callback(callback)
+    return comms_logger.detector
+
+
+def stop_anomaly_detection():
+    comms_logger.detector = None
+
+
+def use_ring_order(bandwidth=None, group=None):
+    '''
+    Route the all_reduce, all_gather_into_tensor and reduce_scatter_tensor calls of ``group`` (None for the world)
+    through a ring ordered to maximize its slowest hop, computed from the pairwise ``bandwidth`` matrix indexed by
+    global rank (e.g. from benchmarks/link_matrix.py) or from the topology. Async calls and reduce ops the ring
+    doesn't implement still go to the backend. Must be called by all ranks of the group. Returns the Ring.
+    '''
+    ring = new_ring(bandwidth, group=group)
+    ring_collectives[group] = ring
+    return ring
+
+
+def clear_ring_order(group=None):
+    ring_collectives.pop(group, None)
+
+
+def dump_flight_recorder(dump_dir=FLIGHT_RECORDER_DUMP_DIR, reason='requested'):
+    '''
+    Write the calling rank's most recent ops to <dump_dir>/rank_<rank>.json. Needs no communication, so it can be
+    called from a signal handler or an exception handler of a stuck job. Returns the path of the dump.
+    '''
+    return flight_recorder.dump(dump_dir, reason=reason)
+
+
 @timed_op
 def reduce(tensor,
            dst,
@@ -446,6 +863,11 @@ def reduce(tensor,
            log_name='reduce',
            debug=get_caller_func()):
     global cdb
+    if comms_memory.enabled:
+        return _within_memory_budget(
+            'reduce', tensor, group, async_op, lambda chunk: cdb.reduce(
+                tensor=tensor if chunk is None else tensor.view(-1)[chunk], dst=dst, op=op, group=group,
+                async_op=async_op))
     return cdb.reduce(tensor=tensor, dst=dst, op=op, group=group, async_op=async_op)
 
 
@@ -500,6 +922,14 @@ def all_reduce(tensor,
     # TensorBoard logging for comm calls.?
     global cdb
     #print(f'op = {op}, cdb= {cdb.name}')
+    if ring_collectives and not async_op:
+        ring = ring_collectives.get(group)
+        if ring is not None and ring.supports(op):
+            return ring.all_reduce(tensor, op)
+    if comms_memory.enabled:
+        return _within_memory_budget(
+            'all_reduce', tensor, group, async_op,
+            lambda chunk: cdb.all_reduce(tensor if chunk is None else tensor.view(-1)[chunk], op, group, async_op))
     return cdb.all_reduce(tensor, op, group, async_op)
 
 
@@ -582,6 +1012,9 @@ def get_local_rank():
     global cdb
     assert cdb is not None and cdb.is_initialized(
     ), 'MCR-DL backend not set, please initialize it using init_process_group()'
+    topology = get_topology()
+    if topology is not None:
+        return topology.get_local_rank()
     return get_local_rank_from_launcher()
 
 
@@ -646,7 +1079,9 @@ def init_distributed(dist_backend=None,
 
     if cdb is None and torch.distributed.is_initialized():
         # The user initialized torch.dist themselves, create cdb and short-circuit
-        cdb = TorchBackend(dist_backend, timeout, init_method)
+        cdb = TorchBackend(dist_backend, init_method=init_method, timeout=timeout)
+        init_topology()
+        flight_recorder.start_watchdog(timeout)
         return
     if dist_init_required is False:
         assert (
@@ -679,13 +1114,29 @@ def init_distributed(dist_backend=None,
                     if int(os.getenv('RANK', '0')) == 0:
                         utils.logger.info('Initializing MPIBackend in MCR-DL')
                     cdb = MPIBackend()
+                else:
+                    # MCR-DL only implements NCCL and MPI natively, other backends (e.g. gloo on CPU) go through torch
+                    if int(os.getenv('RANK', '0')) == 0:
+                        utils.logger.info(
+                            'MCR-DL has no native {} backend, initializing TorchBackend'.format(dist_backend))
+                    cdb = TorchBackend(dist_backend, init_method=init_method, timeout=timeout)
             else:
                 # Create a torch backend object, initialize torch distributed, and assign to cdb
                 if int(os.getenv('RANK', '0')) == 0:
                     utils.logger.info(
                         'Initializing TorchBackend in MCR-DL with backend {}'.format(
                             dist_backend))
-                cdb = TorchBackend(dist_backend, timeout, init_method)
+                cdb = TorchBackend(dist_backend, init_method=init_method, timeout=timeout)
+
+    # Discover which ranks share a node once, so later lookups need no communication
+    if get_topology() is None and cdb is not None and cdb.is_initialized():
+        init_topology()
+        if verbose:
+            utils.logger.info(f'{get_topology()}')
+
+    # Report ops that are pending for longer than the process group timeout and dump the flight recorder
+    if cdb is not None and cdb.is_initialized():
+        flight_recorder.start_watchdog(timeout)
 
 
 def mpi_discovery(distributed_port=TORCH_DISTRIBUTED_DEFAULT_PORT, verbose=True):
@@ -693,22 +1144,19 @@ def mpi_discovery(distributed_port=TORCH_DISTRIBUTED_DEFAULT_PORT, verbose=True)
     Discovery MPI environment via mpi4py and map to relevant dist state
     '''
     from mpi4py import MPI
-    import subprocess
     comm = MPI.COMM_WORLD
     rank = comm.Get_rank()
     world_size = comm.Get_size()
 
     master_addr = None
     if rank == 0:
-        hostname_cmd = ["hostname -I"]
-        result = subprocess.check_output(hostname_cmd, shell=True)
-        master_addr = result.decode('utf-8').split()[0]
+        master_addr = _get_host_address()
     master_addr = comm.bcast(master_addr, root=0)
 
-    # Determine local rank by assuming hostnames are unique
-    proc_name = MPI.Get_processor_name()
-    all_procs = comm.allgather(proc_name)
-    local_rank = sum([i == proc_name for i in all_procs[:rank]])
+    # Ranks that can share memory are on the same node, and the split keeps them in world rank order
+    local_comm = comm.Split_type(MPI.COMM_TYPE_SHARED, key=rank)
+    local_rank = local_comm.Get_rank()
+    local_comm.Free()
 
     os.environ['RANK'] = str(rank)
     os.environ['WORLD_SIZE'] = str(world_size)
@@ -728,6 +1176,24 @@ def mpi_discovery(distributed_port=TORCH_DISTRIBUTED_DEFAULT_PORT, verbose=True)
             world_size, cdb.get_world_size())
 
 
+def _get_host_address():
+    '''
+    Returns the first non-loopback IPv4 address of this host, falling back to ``hostname -I``
+    when the hostname does not resolve to one.
+    '''
+    import socket
+    import subprocess
+    try:
+        for info in socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET):
+            address = info[4][0]
+            if not address.startswith('127.'):
+                return address
+    except socket.gaierror:
+        pass
+    result = subprocess.check_output(["hostname -I"], shell=True)
+    return result.decode('utf-8').split()[0]
+
+
 def in_aml():
     # Are we running inside an Azure Machine Learning (AML) environment?
     return 'AZUREML_EXPERIMENT_ID' in os.environ
@@ -41,7 +41,9 @@ The Comms Logger can be specified as:
   "verbose": false,
   "prof_all": true,
   "debug": false,
-  "prof_ops": ["all_reduce", "custom_all_reduce_name"]
+  "prof_ops": ["all_reduce", "custom_all_reduce_name"],
+  "sample_rate": 1,
+  "sample_steps": 1
 }
 '''
 COMMS_LOGGER = "comms_logger"
@@ -66,6 +68,14 @@ COMMS_LOGGER_DEBUG_DEFAULT = False
 COMMS_LOGGER_PROF_OPS = "prof_ops"
 COMMS_LOGGER_PROF_OPS_DEFAULT = []
 
+# comms logger profiles 1 in sample_rate calls of each (op, message size bucket)
+COMMS_LOGGER_SAMPLE_RATE = "sample_rate"
+COMMS_LOGGER_SAMPLE_RATE_DEFAULT = 1
+
+# comms logger profiles the ops of 1 in sample_steps steps, see mcr_dl.set_comms_step()
+COMMS_LOGGER_SAMPLE_STEPS = "sample_steps"
+COMMS_LOGGER_SAMPLE_STEPS_DEFAULT = 1
+
 
 #############################################
 # Torch distributed constants
@@ -81,3 +91,98 @@ default_pg_timeout = timedelta(minutes=int(os.getenv("MCR-DL_TIMEOUT", default=3
 INFERENCE_GENERIC_MODE = 'generic'
 INFERENCE_SPECIALIZED_MODE = 'specialized'
 
+
+#############################################
+# Object collectives
+#############################################
+# Buffers of at least this many bytes are sent out-of-band as separate tensor transfers instead of being pickled
+OBJECT_OOB_THRESHOLD = int(os.getenv("MCR_DL_OBJECT_OOB_THRESHOLD", default=64 * 1024))
+
+#############################################
+# Flight recorder
+#############################################
+# Set MCR_DL_FLIGHT_RECORDER=0 to disable recording of collectives and the hang watchdog
+FLIGHT_RECORDER_ENABLED = os.getenv("MCR_DL_FLIGHT_RECORDER", default="1") != "0"
+# Number of most recent ops kept per rank, rounded up to a power of 2
+FLIGHT_RECORDER_CAPACITY = int(os.getenv("MCR_DL_FLIGHT_RECORDER_CAPACITY", default=2048))
+# Directory the per-rank dumps (rank_<rank>.json) and the dump trigger file are written to
+FLIGHT_RECORDER_DUMP_DIR = os.getenv("MCR_DL_FLIGHT_RECORDER_DIR", default="mcr_dl_flight_recorder")
+# Seconds between two watchdog checks
+FLIGHT_RECORDER_POLL_INTERVAL = float(os.getenv("MCR_DL_FLIGHT_RECORDER_POLL_INTERVAL", default=1.0))
+
+#############################################
+# Comms tracing
+#############################################
+# Directory the per-rank traces (trace_rank<rank>.json) are written to
+COMMS_TRACE_DIR = os.getenv("MCR_DL_COMMS_TRACE_DIR", default="mcr_dl_comms_trace")
+# Number of events per preallocated trace buffer. Full buffers are handed to the writer thread.
+COMMS_TRACE_BUFFER_SIZE = int(os.getenv("MCR_DL_COMMS_TRACE_BUFFER_SIZE", default=65536))
+# Number of barrier rounds used to estimate the clock offset of each rank to rank 0
+COMMS_TRACE_CLOCK_SYNC_ROUNDS = 8
+
+#############################################
+# Comms metrics exporter
+#############################################
+# Rank r serves its metrics on port COMMS_METRICS_PORT + local rank (only rank 0 serves in aggregated mode)
+COMMS_METRICS_PORT = int(os.getenv("MCR_DL_METRICS_PORT", default=9400))
+COMMS_METRICS_ADDR = os.getenv("MCR_DL_METRICS_ADDR", default="127.0.0.1")
+# Upper bounds of the comm latency histogram buckets, in seconds
+COMMS_METRICS_LATENCY_BUCKETS = [1e-5, 3e-5, 1e-4, 3e-4, 1e-3, 3e-3, 1e-2, 3e-2, 0.1, 0.3, 1.0, 3.0, 10.0]
+
+#############################################
+# Comms log sink
+#############################################
+# Directory the per-rank comms log files (comms_rank<rank>-<segment>.jsonl/.csv) are written to
+COMMS_SINK_DIR = os.getenv("MCR_DL_COMMS_SINK_DIR", default="mcr_dl_comms_log")
+COMMS_SINK_FORMAT = os.getenv("MCR_DL_COMMS_SINK_FORMAT", default="jsonl")
+# A new segment file is started once the current one reaches this many bytes (compressed size with gzip)
+COMMS_SINK_MAX_BYTES = int(os.getenv("MCR_DL_COMMS_SINK_MAX_BYTES", default=256 * 1024 * 1024))
+# The writer thread is woken up once this many records are pending, and at least every flush interval (s)
+COMMS_SINK_FLUSH_RECORDS = 4096
+COMMS_SINK_FLUSH_INTERVAL = 1.0
+
+#############################################
+# torch.profiler integration
+#############################################
+# Wrap MCR-DL ops in record_function ranges while a torch profiler is recording
+PROFILER_RANGES_DEFAULT = os.getenv("MCR_DL_PROFILER_RANGES", default="1") == "1"
+
+#############################################
+# Comms anomaly detection
+#############################################
+# A profiled op is anomalous when its latency exceeds the baseline by more than k times the deviation estimate
+COMMS_ANOMALY_K = float(os.getenv("MCR_DL_ANOMALY_K", default=5.0))
+# Weight of a new latency in the baseline and deviation estimates
+COMMS_ANOMALY_ALPHA = 0.05
+# Ops of an (op, size bucket, group) observed before it can be flagged
+COMMS_ANOMALY_WARMUP = 20
+# Upper bound on the number of tracked (op, size bucket, group) baselines
+COMMS_ANOMALY_MAX_KEYS = 4096
+# The slowest rank is determined every that many steps (see mcr_dl.set_comms_step())
+COMMS_ANOMALY_CHECK_STEPS = int(os.getenv("MCR_DL_ANOMALY_CHECK_STEPS", default=100))
+# A rank is slow in a check when its collectives took this fraction less time than the median rank's, i.e. the
+# other ranks waited for it, and reported once it was slow in this many consecutive checks
+COMMS_ANOMALY_SLOW_RANK_THRESHOLD = 0.2
+COMMS_ANOMALY_SLOW_RANK_CHECKS = 3
+
+#############################################
+# Ring ordering
+#############################################
+# Number of start ranks of the greedy widest-neighbor ring construction
+RING_ORDER_STARTS = 16
+# Random rings the bottleneck search restarts from when the best ring so far can't be repaired
+RING_ORDER_RESTARTS = 4
+# Relative link bandwidths assumed when no measured matrix is given and the order is derived from the topology
+RING_SAME_SOCKET_BW = 1.0
+RING_CROSS_SOCKET_BW = 0.5
+RING_CROSS_NODE_BW = 0.1
+
+#############################################
+# Comms memory accounting
+#############################################
+# Track the staging and scratch memory of communication, see mcr_dl/utils/comms_memory.py
+COMMS_MEMORY_ACCOUNTING = os.getenv("MCR_DL_COMMS_MEMORY_ACCOUNTING", default="0") != "0"
+# Bytes communication may allocate at a time before ops fall back to chunks, unset (0) for no limit
+COMMS_MEMORY_BUDGET = int(os.getenv("MCR_DL_COMMS_MEMORY_BUDGET", default=0)) or None
+# Chunks are not made smaller than this, however little of the budget is left
+COMMS_MEMORY_MIN_CHUNK_BYTES = 1024 * 1024
@@ -50,6 +50,12 @@ class CUDA_Accelerator():
         except pynvml.NVMLError:
             pynvml = None
             return
+
+    def is_synchronized_device(self):
+        # Without a GPU, ops run on the host and host timers measure them accurately
+        return not torch.cuda.is_available()
+
+    @property
     def Event(self):
         return torch.cuda.Event
 
@@ -74,13 +80,34 @@ class CUDA_Accelerator():
     def device_count(self):
         return torch.cuda.device_count()
 
+    def is_available(self):
+        return torch.cuda.is_available()
+
     def synchronize(self, device_index=None):
+        if self.is_synchronized_device():
+            return
         return torch.cuda.synchronize(device_index)
 
+    # Streams/Events
+    def current_stream(self, device_index=None):
+        return torch.cuda.current_stream(device_index)
+
     # Memory management
     def empty_cache(self):
         return torch.cuda.empty_cache()
 
+    def memory_allocated(self, device_index=None):
+        return torch.cuda.memory_allocated(device_index)
+
+    def max_memory_allocated(self, device_index=None):
+        return torch.cuda.max_memory_allocated(device_index)
+
+    def memory_cached(self, device_index=None):
+        return torch.cuda.memory_reserved(device_index)
+
+    def max_memory_cached(self, device_index=None):
+        return torch.cuda.max_memory_reserved(device_index)
+
     def total_memory(self, device_index=None):
         return torch.cuda.get_device_properties(device_index).total_memory
 
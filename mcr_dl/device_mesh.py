@@ -0,0 +1,124 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+MCR-DL Device Mesh
+
+Lays the ranks of a job out on an N-dimensional mesh (e.g. pp x dp x tp) and creates the process groups along every
+mesh dimension. Instead of every process calling new_group() for every group of every dimension, each dimension is
+created with a single mcr_dl.new_subgroups() call, which lets the backend only build the group the calling process
+belongs to. Groups are cached by their rank list, so meshes that share a dimension reuse the same communicator.
+
+    mesh = mcr_dl.DeviceMesh((2, 2, 2), dim_names=('pp', 'dp', 'tp'))
+    mcr_dl.all_reduce(grads, group=mesh.get_group('dp'))
+"""
+
+from functools import reduce
+from operator import mul
+
+
+class DeviceMesh():
+    """
+    N-dimensional mesh of global ranks laid out in row-major order (the last dimension varies fastest).
+
+    Arguments:
+        shape: (tuple of int). Size of every mesh dimension. Their product must equal the world size.
+        dim_names: Optional (tuple of str). Name of every mesh dimension, e.g. ('pp', 'dp', 'tp').
+    """
+
+    def __init__(self, shape, dim_names=None):
+        import mcr_dl.comm as dist
+
+        self.shape = tuple(int(s) for s in shape)
+        self.ndim = len(self.shape)
+        self.size = reduce(mul, self.shape, 1)
+        if dim_names is None:
+            dim_names = tuple(f'dim{d}' for d in range(self.ndim))
+        self.dim_names = tuple(dim_names)
+        if len(self.dim_names) != self.ndim:
+            raise ValueError(f"Got {len(self.dim_names)} dim_names for a mesh with {self.ndim} dimensions")
+        if len(set(self.dim_names)) != self.ndim:
+            raise ValueError(f"Mesh dimension names must be unique, got {self.dim_names}")
+        world_size = dist.get_world_size()
+        if self.size != world_size:
+            raise ValueError(f"Mesh shape {self.shape} has {self.size} ranks but the world size is {world_size}")
+
+        self._dim_index = {name: d for d, name in enumerate(self.dim_names)}
+        # Row-major strides, so rank = sum(coordinate[d] * stride[d])
+        self._strides = [reduce(mul, self.shape[d + 1:], 1) for d in range(self.ndim)]
+
+        self.rank = dist.get_rank()
+        self.coordinate = self.get_coordinate(self.rank)
+
+        self._groups = []
+        self._group_ranks = []
+        for d in range(self.ndim):
+            ranks_list = self._ranks_along_dim(d)
+            self._groups.append(dist.new_subgroups(ranks_list))
+            self._group_ranks.append(self._ranks_through(self.coordinate, d))
+
+    def _dim(self, dim):
+        # Accept both dimension names and indices
+        if isinstance(dim, str):
+            if dim not in self._dim_index:
+                raise KeyError(f"Unknown mesh dimension '{dim}', expected one of {self.dim_names}")
+            return self._dim_index[dim]
+        return dim
+
+    def _ranks_through(self, coordinate, d):
+        # All ranks that only differ from ``coordinate`` along dimension d
+        base = self.get_rank(coordinate) - coordinate[d] * self._strides[d]
+        return [base + i * self._strides[d] for i in range(self.shape[d])]
+
+    def _ranks_along_dim(self, d):
+        # One rank list per group along dimension d, i.e. one per coordinate with coordinate[d] == 0
+        ranks_list = []
+        for rank in range(self.size):
+            coordinate = self.get_coordinate(rank)
+            if coordinate[d] == 0:
+                ranks_list.append(self._ranks_through(coordinate, d))
+        return ranks_list
+
+    def get_group(self, dim):
+        """Group along mesh dimension ``dim`` (name or index) that contains the calling rank."""
+        return self._groups[self._dim(dim)]
+
+    def get_group_ranks(self, dim):
+        """Global ranks of the calling rank's group along mesh dimension ``dim``."""
+        return self._group_ranks[self._dim(dim)]
+
+    def get_dim_size(self, dim):
+        return self.shape[self._dim(dim)]
+
+    def get_local_rank(self, dim):
+        """Rank of the calling process within its group along mesh dimension ``dim``."""
+        return self.coordinate[self._dim(dim)]
+
+    def get_coordinate(self, rank=None):
+        """Mesh coordinate of global ``rank`` (default: the calling rank)."""
+        if rank is None:
+            return self.coordinate
+        return tuple((rank // stride) % size for stride, size in zip(self._strides, self.shape))
+
+    def get_rank(self, coordinate):
+        """Global rank at mesh ``coordinate``."""
+        return sum(c * stride for c, stride in zip(coordinate, self._strides))
+
+    def __repr__(self):
+        dims = ', '.join(f'{name}={size}' for name, size in zip(self.dim_names, self.shape))
+        return f"DeviceMesh({dims}, rank={self.rank}, coordinate={self.coordinate})"
@@ -89,6 +89,12 @@ class MPIBackend(Backend):
     def is_initialized(self):
         return self.initialized
 
+    def scratch_bytes(self, op_name, tensor, group=None):
+        # The C++ allreduce and reduce allocate a receive buffer like the tensor
+        if op_name in ('all_reduce', 'reduce'):
+            return tensor.numel() * tensor.element_size()
+        return 0
+
     def barrier(self, group=None, async_op=False):
         return self.mpi_comm_op.barrier()
 
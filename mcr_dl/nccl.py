@@ -91,6 +91,12 @@ class NCCLBackend(Backend):
     def is_initialized(self):
         return self.initialized
 
+    def scratch_bytes(self, op_name, tensor, group=None):
+        # The list all_gather gathers into a flat buffer of all outputs before copying them into the list
+        if op_name == 'all_gather':
+            return self.get_world_size(group) * tensor.numel() * tensor.element_size()
+        return 0
+
     def get_world_group(self):
         return self.nccl_comm_op.get_world_group()
 
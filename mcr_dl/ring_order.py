@@ -0,0 +1,309 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+MCR-DL Ring Ordering
+
+Ring collectives are only as fast as their slowest hop, and the default ring follows rank ids. When ranks are placed
+unevenly (e.g. round-robin over nodes) or a link is degraded, that puts slow links on the critical path.
+bottleneck_ring() orders the ranks from a pairwise bandwidth matrix (see benchmarks/link_matrix.py), or from the
+topology, so that the slowest hop of the ring is as fast as possible: greedy widest-neighbor tours, then a binary
+search on the bottleneck that uses 2-opt and or-opt moves to get rid of the hops below the threshold.
+
+Backends order their rings by group rank, and new_group() sorts its ranks, so the order can't be handed to them
+through a group. Ring instead runs reduce_scatter, all_gather and all_reduce as rings of non-blocking point-to-point
+transfers in the computed order. Chunks are indexed by group rank throughout, so results come out in the usual
+group rank order. mcr_dl.use_ring_order() routes a group's collectives through a Ring.
+
+    ring = mcr_dl.use_ring_order(bandwidth=np.load('link_matrix_bw_gbps.npy'))
+    mcr_dl.all_reduce(grads)
+"""
+
+import numpy as np
+import torch
+
+from mcr_dl.constants import RING_ORDER_STARTS, RING_ORDER_RESTARTS, RING_SAME_SOCKET_BW, RING_CROSS_SOCKET_BW, RING_CROSS_NODE_BW
+from mcr_dl.reduce_op import ReduceOp
+
+
+def _symmetric_bandwidth(bandwidth):
+    bw = np.array(bandwidth, dtype=np.float64)
+    bw[np.isnan(bw)] = 0.0
+    # A hop is only as fast as its slower direction
+    return np.minimum(bw, bw.T)
+
+
+def ring_hops(order, bandwidth):
+    """Bandwidth of every hop of the ring ``order``, hop i going from order[i] to order[i + 1]."""
+    order = np.asarray(order)
+    return np.asarray(bandwidth)[order, np.roll(order, -1)]
+
+
+def ring_bottleneck(order, bandwidth):
+    return ring_hops(order, _symmetric_bandwidth(bandwidth)).min()
+
+
+def _widest_neighbor_ring(start, bw):
+    n = len(bw)
+    visited = np.zeros(n, dtype=bool)
+    order = [start]
+    visited[start] = True
+    for _ in range(n - 1):
+        candidates = np.where(visited, -np.inf, bw[order[-1]])
+        nxt = int(np.argmax(candidates))
+        order.append(nxt)
+        visited[nxt] = True
+    return order
+
+
+def _two_opt(order, cost, max_passes=None):
+    # Replacing hops (a, b) and (c, d) by (a, c) and (b, d) reverses order[i + 1:j + 1]. Each pass takes the best
+    # move for every i that lowers the summed cost of the two hops.
+    order = np.array(order)
+    n = len(order)
+    for _ in range(max_passes or n):
+        improved = False
+        for i in range(n - 2):
+            a, b = order[i], order[i + 1]
+            j = np.arange(i + 2, n if i > 0 else n - 1)
+            if j.size == 0:
+                continue
+            c, d = order[j], order[(j + 1) % n]
+            gain = cost[a, b] + cost[c, d] - cost[a, c] - cost[b, d]
+            best = int(np.argmax(gain))
+            if gain[best] > 0:
+                order[i + 1:j[best] + 1] = order[i + 1:j[best] + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return order.tolist()
+
+
+def _or_opt(order, cost, max_passes=None):
+    # Moves a single rank to the hop where it lowers the summed cost the most
+    order = list(order)
+    n = len(order)
+    for _ in range(max_passes or n):
+        improved = False
+        for i in range(n):
+            p, v, q = order[i - 1], order[i], order[(i + 1) % n]
+            rest = order[:i] + order[i + 1:]
+            x = np.array(rest)
+            y = np.roll(x, -1)
+            gain = cost[p, v] + cost[v, q] + cost[x, y] - cost[p, q] - cost[x, v] - cost[v, y]
+            k = int(np.argmax(gain))
+            if gain[k] > 0:
+                order = rest[:k + 1] + [v] + rest[k + 1:]
+                improved = True
+                break
+        if not improved:
+            break
+    return order
+
+
+def _repair(order, cost, max_rounds=20):
+    # 2-opt and or-opt get stuck in different local minima, alternate them until neither helps
+    for _ in range(max_rounds):
+        repaired = _or_opt(_two_opt(order, cost), cost)
+        if repaired == order:
+            break
+        order = repaired
+    return order
+
+
+def bottleneck_ring(bandwidth, starts=RING_ORDER_STARTS, restarts=RING_ORDER_RESTARTS, seed=0):
+    """
+    Returns an order of the ranks 0..n-1 of the n x n ``bandwidth`` matrix (NaN for unmeasured links) whose slowest
+    hop is as fast as the heuristic can make it.
+
+    Greedy widest-neighbor tours from several start ranks give a first ring. Then the bottleneck is raised by a
+    binary search over the link bandwidths: for a threshold t, 2-opt and or-opt minimize the number of hops slower
+    than t, starting from the best ring so far and then from ``restarts`` random rings, and t is feasible once no
+    such hop is left. The result is deterministic for a given ``seed``.
+    """
+    bw = _symmetric_bandwidth(bandwidth)
+    n = len(bw)
+    if n <= 3:
+        # Every ring over 3 ranks uses the same links
+        return list(range(n))
+    best_order, best_bottleneck = None, None
+    # Start ranks spread over the matrix, so that different regions of it get to start a tour
+    for start in sorted(set(np.linspace(0, n - 1, min(starts, n)).astype(int).tolist())):
+        order = _widest_neighbor_ring(start, bw)
+        bottleneck = ring_hops(order, bw).min()
+        if best_bottleneck is None or bottleneck > best_bottleneck:
+            best_order, best_bottleneck = order, bottleneck
+
+    rng = np.random.default_rng(seed)
+    random_rings = [rng.permutation(n).tolist() for _ in range(restarts)]
+    thresholds = np.unique(bw[bw > best_bottleneck])
+    low, high = 0, len(thresholds) - 1
+    while low <= high:
+        mid = (low + high) // 2
+        cost = (bw < thresholds[mid]).astype(np.int64)
+        for start in [best_order] + random_rings:
+            order = _repair(start, cost)
+            feasible = ring_hops(order, bw).min() >= thresholds[mid]
+            if feasible:
+                break
+        if feasible:
+            best_order = order
+            low = mid + 1
+        else:
+            high = mid - 1
+    # Rotate so the ring starts at the lowest rank, which keeps the order stable across equivalent rings
+    first = best_order.index(0)
+    return best_order[first:] + best_order[:first]
+
+
+def topology_bandwidth(topology, ranks=None):
+    """Relative bandwidth matrix of ``ranks`` (default: all) derived from which node and socket they are on."""
+    ranks = list(range(topology.world_size)) if ranks is None else list(ranks)
+    nodes = np.array([topology.get_node_id(r) for r in ranks])
+    sockets = np.array([topology.get_socket(r) for r in ranks])
+    same_node = nodes[:, None] == nodes[None, :]
+    same_socket = same_node & (sockets[:, None] == sockets[None, :])
+    return np.where(same_socket, RING_SAME_SOCKET_BW, np.where(same_node, RING_CROSS_SOCKET_BW,
+                                                                 RING_CROSS_NODE_BW))
+
+
+def _add(acc, other):
+    acc.add_(other)
+
+
+def _mul(acc, other):
+    acc.mul_(other)
+
+
+def _min(acc, other):
+    torch.minimum(acc, other, out=acc)
+
+
+def _max(acc, other):
+    torch.maximum(acc, other, out=acc)
+
+
+_COMBINE = {
+    ReduceOp.SUM: _add,
+    ReduceOp.AVG: _add,
+    ReduceOp.PRODUCT: _mul,
+    ReduceOp.MIN: _min,
+    ReduceOp.MAX: _max,
+}
+
+
+class Ring():
+    """
+    Ring collectives over the ranks of ``group`` in the order ``order``.
+
+    Arguments:
+        order: (list of int). Global ranks of the group, in ring order.
+        group: Optional. Process group the ranks belong to, None for the world.
+    """
+
+    def __init__(self, order, group=None):
+        import mcr_dl.comm as dist
+
+        self.order = [int(r) for r in order]
+        self.group = group
+        self.size = len(self.order)
+        group_ranks = list(range(dist.get_world_size())) if group is None else dist.get_all_ranks_from_group(group)
+        if sorted(self.order) != sorted(group_ranks):
+            raise ValueError(f"Ring order {self.order} is not a permutation of the group ranks {group_ranks}")
+        if not hasattr(dist.cdb, 'isend') or not hasattr(dist.cdb, 'irecv'):
+            raise RuntimeError(f"Ring collectives need non-blocking point-to-point ops, which the {dist.cdb.name} "
+                               f"backend does not provide")
+        # Backends number group ranks in order of the global ranks
+        group_rank = {r: i for i, r in enumerate(sorted(group_ranks))}
+        self.position = self.order.index(dist.get_rank())
+        self.next = self.order[(self.position + 1) % self.size]
+        self.prev = self.order[(self.position - 1) % self.size]
+        # Group rank of the rank at every ring position, which is the chunk index that rank owns
+        self.chunk_index = [group_rank[r] for r in self.order]
+
+    def supports(self, op):
+        return op in _COMBINE
+
+    def _exchange(self, send_buffer, recv_buffer):
+        import mcr_dl.comm as dist
+
+        send = dist.cdb.isend(send_buffer, self.next, group=self.group)
+        recv = dist.cdb.irecv(recv_buffer, src=self.prev, group=self.group)
+        send.wait()
+        recv.wait()
+
+    def _chunk(self, step):
+        return self.chunk_index[(self.position - step) % self.size]
+
+    def reduce_scatter(self, output_tensor, input_tensor, op=ReduceOp.SUM):
+        """Like reduce_scatter_tensor: ``input_tensor`` holds one chunk per group rank, in group rank order."""
+        n = self.size
+        acc = input_tensor.reshape(n, -1).clone()
+        recv = torch.empty_like(acc[0])
+        combine = _COMBINE[op]
+        # At step s, the chunk that has been reduced over s + 1 ranks moves one hop further
+        for step in range(n - 1):
+            self._exchange(acc[self._chunk(step + 1)], recv)
+            combine(acc[self._chunk(step + 2)], recv)
+        output_tensor.view(-1).copy_(acc[self.chunk_index[self.position]])
+        if op == ReduceOp.AVG:
+            output_tensor.div_(n)
+        return output_tensor
+
+    def all_gather(self, output_tensor, input_tensor):
+        """Like all_gather_into_tensor: ``output_tensor`` receives one chunk per group rank, in group rank order."""
+        n = self.size
+        chunks = output_tensor.view(n, -1)
+        chunks[self.chunk_index[self.position]].copy_(input_tensor.view(-1))
+        for step in range(n - 1):
+            self._exchange(chunks[self._chunk(step)], chunks[self._chunk(step + 1)])
+        return output_tensor
+
+    def all_reduce(self, tensor, op=ReduceOp.SUM):
+        """In place, as a reduce_scatter followed by an all_gather over chunks padded to a multiple of the size."""
+        n = self.size
+        numel = tensor.numel()
+        chunk_numel = (numel + n - 1) // n
+        buffer = torch.zeros(n * chunk_numel, dtype=tensor.dtype, device=tensor.device)
+        buffer[:numel].copy_(tensor.reshape(-1))
+        reduced = torch.empty(chunk_numel, dtype=tensor.dtype, device=tensor.device)
+        self.reduce_scatter(reduced, buffer, op)
+        self.all_gather(buffer, reduced)
+        tensor.copy_(buffer[:numel].view_as(tensor))
+        return tensor
+
+
+def new_ring(bandwidth=None, group=None):
+    """
+    Compute the ring order of ``group`` (None for the world) on its first rank and share it with the others, so
+    all ranks use the same ring even if their matrices differ. ``bandwidth`` is indexed by global rank; without it
+    the order is derived from the topology. Must be called by all ranks of the group.
+    """
+    import mcr_dl.comm as dist
+
+    ranks = list(range(dist.get_world_size())) if group is None else dist.get_all_ranks_from_group(group)
+    order = None
+    if dist.get_rank() == ranks[0]:
+        if bandwidth is None:
+            bandwidth = topology_bandwidth(dist.get_topology(), ranks)
+        else:
+            bandwidth = np.asarray(bandwidth)[np.ix_(ranks, ranks)]
+        order = [ranks[i] for i in bottleneck_ring(bandwidth)]
+    objects = [order]
+    dist.broadcast_object_list(objects, src=ranks[0], group=group)
+    return Ring(objects[0], group=group)
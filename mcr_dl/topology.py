@@ -0,0 +1,233 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+MCR-DL Topology
+
+Records which ranks share a node and where each rank is placed on that node. The topology is built once by
+init_distributed(): every rank packs (host id, NUMA node, CPU socket) into a small int64 tensor and a single
+all_gather distributes the records to all ranks. Intra-node and cross-node (same local rank) groups are created
+at the same time and cached, so hierarchical algorithms, affinity binding and logging can look them up without
+any further communication.
+"""
+
+import os
+import glob
+import socket
+import hashlib
+
+# Order of the fields in the packed per-rank record
+HOST_ID_FIELD = 0
+NUMA_NODE_FIELD = 1
+SOCKET_FIELD = 2
+NUM_FIELDS = 3
+
+# Placement value used when a rank is not bound to a single NUMA node / socket
+UNKNOWN_PLACEMENT = -1
+
+_topology = None
+
+
+def get_host_id(hostname=None):
+    """Stable signed 64-bit id of a hostname, so it fits in an int64 tensor."""
+    hostname = socket.gethostname() if hostname is None else hostname
+    digest = hashlib.blake2b(hostname.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, byteorder='little', signed=True)
+
+
+def _parse_cpu_list(cpu_list):
+    # Parse the kernel's cpulist format, e.g. "0-3,8,10-11"
+    cpus = set()
+    for part in cpu_list.strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-')
+            cpus.update(range(int(start), int(end) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+def _read_sysfs(path):
+    try:
+        with open(path, 'r') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def get_cpu_placement():
+    """
+    Returns (numa_node, socket) of the CPUs the calling process is bound to.
+    Either value is UNKNOWN_PLACEMENT if the affinity mask spans more than one node/socket or sysfs is unavailable.
+    """
+    try:
+        cpus = os.sched_getaffinity(0)
+    except AttributeError:
+        return UNKNOWN_PLACEMENT, UNKNOWN_PLACEMENT
+
+    numa_nodes = set()
+    for node_dir in glob.glob('/sys/devices/system/node/node[0-9]*'):
+        cpu_list = _read_sysfs(os.path.join(node_dir, 'cpulist'))
+        if cpu_list is not None and _parse_cpu_list(cpu_list) & cpus:
+            numa_nodes.add(int(os.path.basename(node_dir)[len('node'):]))
+
+    sockets = set()
+    for cpu in cpus:
+        package_id = _read_sysfs(f'/sys/devices/system/cpu/cpu{cpu}/topology/physical_package_id')
+        if package_id is None:
+            sockets.clear()
+            break
+        sockets.add(int(package_id))
+
+    numa_node = numa_nodes.pop() if len(numa_nodes) == 1 else UNKNOWN_PLACEMENT
+    cpu_socket = sockets.pop() if len(sockets) == 1 else UNKNOWN_PLACEMENT
+    return numa_node, cpu_socket
+
+
+class Topology():
+    """
+    Per-rank node layout of a job. All lookups are O(1) list/dict accesses.
+
+    Arguments:
+        rank: global rank of the calling process
+        records: list with one (host_id, numa_node, socket) tuple per global rank
+    """
+
+    def __init__(self, rank, records):
+        self.rank = rank
+        self.world_size = len(records)
+        self.host_ids = [r[HOST_ID_FIELD] for r in records]
+        self.numa_nodes = [r[NUMA_NODE_FIELD] for r in records]
+        self.sockets = [r[SOCKET_FIELD] for r in records]
+
+        # Nodes are numbered in order of their lowest global rank, so rank 0 is always on node 0
+        node_of_host = {}
+        self.node_ids = []
+        self.local_ranks = []
+        self.node_ranks = []
+        for global_rank, host_id in enumerate(self.host_ids):
+            if host_id not in node_of_host:
+                node_of_host[host_id] = len(self.node_ranks)
+                self.node_ranks.append([])
+            node_id = node_of_host[host_id]
+            self.node_ids.append(node_id)
+            self.local_ranks.append(len(self.node_ranks[node_id]))
+            self.node_ranks[node_id].append(global_rank)
+        self.num_nodes = len(self.node_ranks)
+        self.local_sizes = [len(self.node_ranks[node_id]) for node_id in self.node_ids]
+        self.max_local_size = max(self.local_sizes)
+
+        # Ranks sharing a local rank across nodes, indexed by local rank
+        self.cross_node_ranks = [[ranks[local_rank] for ranks in self.node_ranks if local_rank < len(ranks)]
+                                 for local_rank in range(self.max_local_size)]
+
+        self.intra_node_group = None
+        self.cross_node_group = None
+
+    def _rank(self, rank):
+        return self.rank if rank is None else rank
+
+    def get_node_id(self, rank=None):
+        return self.node_ids[self._rank(rank)]
+
+    def get_local_rank(self, rank=None):
+        return self.local_ranks[self._rank(rank)]
+
+    def get_local_size(self, rank=None):
+        return self.local_sizes[self._rank(rank)]
+
+    def get_num_nodes(self):
+        return self.num_nodes
+
+    def get_numa_node(self, rank=None):
+        return self.numa_nodes[self._rank(rank)]
+
+    def get_socket(self, rank=None):
+        return self.sockets[self._rank(rank)]
+
+    def get_node_ranks(self, node_id=None):
+        """Global ranks on node ``node_id`` (default: the caller's node)."""
+        return self.node_ranks[self.get_node_id() if node_id is None else node_id]
+
+    def get_cross_node_ranks(self, local_rank=None):
+        """Global ranks with local rank ``local_rank`` (default: the caller's local rank), one per node."""
+        return self.cross_node_ranks[self.get_local_rank() if local_rank is None else local_rank]
+
+    def same_node(self, rank_a, rank_b):
+        return self.node_ids[rank_a] == self.node_ids[rank_b]
+
+    def build_groups(self):
+        """
+        Create and cache the calling rank's intra-node and cross-node groups. Each kind of group is created with a
+        single new_subgroups() call, which has to be made collectively by all ranks.
+        """
+        import mcr_dl.comm as dist
+
+        self.intra_node_group = dist.new_subgroups(self.node_ranks)
+        self.cross_node_group = dist.new_subgroups(self.cross_node_ranks)
+
+    def get_intra_node_group(self):
+        """Group of all ranks on the caller's node."""
+        return self.intra_node_group
+
+    def get_cross_node_group(self):
+        """Group of the ranks with the caller's local rank, one per node."""
+        return self.cross_node_group
+
+    def __repr__(self):
+        return (f"Topology(rank={self.rank}, node_id={self.get_node_id()}, local_rank={self.get_local_rank()}, "
+                f"local_size={self.get_local_size()}, num_nodes={self.num_nodes}, "
+                f"numa_node={self.get_numa_node()}, socket={self.get_socket()})")
+
+
+def init_topology(build_groups=True):
+    """
+    Discover the topology of the initialized MCR-DL backend with a single packed all_gather.
+    Must be called collectively by all ranks.
+    """
+    global _topology
+    import torch
+    import mcr_dl.comm as dist
+
+    rank = dist.get_rank()
+    world_size = dist.get_world_size()
+    numa_node, cpu_socket = get_cpu_placement()
+
+    record = [0] * NUM_FIELDS
+    record[HOST_ID_FIELD] = get_host_id()
+    record[NUMA_NODE_FIELD] = numa_node
+    record[SOCKET_FIELD] = cpu_socket
+
+    device = dist.get_comm_device()
+    local_record = torch.tensor(record, dtype=torch.int64, device=device)
+    all_records = torch.empty(world_size * NUM_FIELDS, dtype=torch.int64, device=device)
+    dist.allgather_fn(all_records, local_record)
+    all_records = all_records.view(world_size, NUM_FIELDS).tolist()
+
+    topology = Topology(rank, all_records)
+    if build_groups:
+        topology.build_groups()
+    _topology = topology
+    return _topology
+
+
+def get_topology():
+    """Returns the topology built by init_distributed(), or None if it has not been built."""
+    return _topology
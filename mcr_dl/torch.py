@@ -53,6 +53,11 @@ def torch_ver_ge_1_13():
     return False
 
 
+def has_local_synchronization():
+    import inspect
+    return 'use_local_synchronization' in inspect.signature(torch.distributed.new_group).parameters
+
+
 def has_coalescing_manager():
     has_c10d = hasattr(torch.distributed, 'distributed_c10d')
     return has_c10d and hasattr(torch.distributed.distributed_c10d, '_coalescing_manager')
@@ -124,6 +129,7 @@ class TorchBackend(Backend):
         super(TorchBackend, self).__init__()
         self.has_all_reduce_coalesced = has_all_reduce_coalesced()
         self.has_coalescing_manager = has_coalescing_manager()
+        self.has_local_synchronization = has_local_synchronization()
         self.all_gather_function = self.get_all_gather_function()
         self.reduce_scatter_function = self.get_reduce_scatter_function()
         self.initialized = True
@@ -202,7 +208,7 @@ class TorchBackend(Backend):
                                                     group=group,
                                                     async_op=async_op)
 
-    def broadcast(self, tensor, src, group=None, async_op=False):
+    def broadcast(self, tensor, src, op=None, group=None, async_op=False):
         if DS_COMM_BROADCAST_OFF:
             if int(os.getenv('RANK', '0')) == 0:
                 utils.logger.warning("BROADCAST  is OFF")
@@ -346,6 +352,17 @@ class TorchBackend(Backend):
     def new_group(self, ranks):
         return torch.distributed.new_group(ranks)
 
+    def new_subgroups(self, ranks_list):
+        if self.has_local_synchronization:
+            # Only the members of a group take part in its creation, so each rank builds a single group
+            rank = self.get_rank()
+            for ranks in ranks_list:
+                if rank in ranks:
+                    return torch.distributed.new_group(ranks, use_local_synchronization=True)
+            return None
+        group, _ = torch.distributed.new_subgroups_by_enumeration(ranks_list)
+        return group
+
     def get_global_rank(self, group, group_rank):
         if hasattr(torch.distributed.distributed_c10d, "get_global_rank"):
             from torch.distributed.distributed_c10d import get_global_rank as _get_global_rank
@@ -0,0 +1,207 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+MCR-DL Comms Anomaly Detection
+
+Flags slow collectives and the rank slowing down its peers, on top of the ops profiled by the CommsLogger.
+
+Every (op, message size bucket, group) keeps a baseline of its latency and an estimate of the median absolute
+deviation (MAD) around it, both exponentially weighted, so an op costs O(1) time and every baseline a fixed amount
+of memory. Latencies are clipped to the anomaly threshold before they update the baseline, so a burst of slow ops
+does not drag the baseline up with it. An op slower than baseline + k * MAD is reported as an anomaly.
+
+Every check_interval steps, check_ranks() all-gathers one packed tensor of per-rank totals. In a collective, the
+ranks that arrive early wait for the late one, so the rank that spends clearly less time in collectives than the
+median of the other ranks is the one they wait for (slow GPU, throttling, a slow data loader). Degraded links slow
+down all ranks of a collective alike and show up in the per-rank anomaly counts instead. A rank that is the
+slowest in several consecutive checks is reported as a slow rank.
+
+Reports are logged and passed to the registered callbacks as dicts, e.g. for alerting.
+"""
+
+from mcr_dl.constants import (COMMS_ANOMALY_K, COMMS_ANOMALY_ALPHA, COMMS_ANOMALY_WARMUP, COMMS_ANOMALY_MAX_KEYS,
+                              COMMS_ANOMALY_CHECK_STEPS, COMMS_ANOMALY_SLOW_RANK_THRESHOLD,
+                              COMMS_ANOMALY_SLOW_RANK_CHECKS)
+from mcr_dl.utils.flight_recording import P2P_OPS
+from mcr_dl.utils.comms_metrics import group_label
+
+# Indices into the per-key state lists
+COUNT = 0
+BASELINE = 1
+MAD = 2
+ANOMALIES = 3
+
+# Scale of the MAD of a normal distribution to its standard deviation, so k reads as a number of sigmas
+MAD_TO_STD = 1.4826
+
+# Entries of the tensor packed by check_ranks()
+_COLLECTIVE_MS = 0
+_CALLS = 1
+_ANOMALIES = 2
+
+
+class AnomalyDetector():
+    """
+    Rolling latency baselines of profiled comm ops.
+
+    Arguments:
+        k: Optional (float). Number of (normal-scaled) MADs above the baseline at which an op is anomalous.
+        alpha: Optional (float). Weight of a new latency in the baseline and MAD.
+        warmup: Optional (int). Number of ops of a key observed before it can be flagged.
+        check_interval: Optional (int). Steps between two check_ranks(), 0 disables the periodic check.
+        max_keys: Optional (int). Upper bound on the number of tracked baselines.
+    """
+
+    def __init__(self,
+                 k=COMMS_ANOMALY_K,
+                 alpha=COMMS_ANOMALY_ALPHA,
+                 warmup=COMMS_ANOMALY_WARMUP,
+                 check_interval=COMMS_ANOMALY_CHECK_STEPS,
+                 max_keys=COMMS_ANOMALY_MAX_KEYS):
+        self.k = k
+        self.alpha = alpha
+        self.warmup = warmup
+        self.check_interval = check_interval
+        self.max_keys = max_keys
+        self.callbacks = []
+        self.step = 0
+        # (op, size bucket, group) -> [count, baseline ms, MAD ms, anomalies]
+        self.baselines = {}
+        # Totals since the last check_ranks()
+        self.collective_ms = 0.0
+        self.calls = 0
+        self.anomalies = 0
+        # Rank found slowest in the last checks, and in how many consecutive checks
+        self.slow_rank = None
+        self.slow_checks = 0
+
+    def add_callback(self, callback):
+        """``callback(report)`` is called with a dict for every anomaly and every slow rank report."""
+        self.callbacks.append(callback)
+
+    def _report(self, report):
+        from mcr_dl.utils import logger
+        if report['type'] == 'slow_op':
+            logger.warning(f"Slow {report['op']} of {report['size']} bytes: {report['latency_ms']:.3f} ms, "
+                           f"baseline {report['baseline_ms']:.3f} ms (+/- {report['mad_ms']:.3f} ms), "
+                           f"step {report['step']}")
+        else:
+            logger.warning(f"Rank {report['rank']} is slowing down its peers: {report['collective_ms']:.1f} ms in "
+                           f"collectives vs a median of {report['median_ms']:.1f} ms on the other ranks over the last "
+                           f"{report['checks']} checks")
+        for callback in self.callbacks:
+            callback(report)
+
+    def observe(self, op, group, size, latency):
+        """Add one profiled op of ``size`` bytes that took ``latency`` ms. Returns True if it was anomalous."""
+        if op not in P2P_OPS:
+            self.collective_ms += latency
+            self.calls += 1
+        key = (op, size.bit_length(), group)
+        state = self.baselines.get(key)
+        if state is None:
+            if len(self.baselines) >= self.max_keys:
+                return False
+            self.baselines[key] = [1, latency, 0.0, 0]
+            return False
+        count, baseline, mad = state[COUNT], state[BASELINE], state[MAD]
+        threshold = baseline + self.k * MAD_TO_STD * mad
+        anomalous = count >= self.warmup and latency > threshold
+        if anomalous:
+            state[ANOMALIES] += 1
+            self.anomalies += 1
+            self._report({
+                'type': 'slow_op',
+                'op': op,
+                'size': size,
+                'group': group_label(group),
+                'latency_ms': latency,
+                'baseline_ms': baseline,
+                'mad_ms': mad,
+                'step': self.step,
+            })
+        if count >= self.warmup:
+            # Clipped, so outliers move the baseline by at most the threshold
+            latency = min(latency, threshold) if anomalous else latency
+            alpha = self.alpha
+        else:
+            # Plain running means during the warmup, so the estimates don't start out biased towards 0
+            alpha = max(self.alpha, 1 / (count + 1))
+        state[COUNT] = count + 1
+        state[BASELINE] = baseline + alpha * (latency - baseline)
+        state[MAD] = mad + alpha * (abs(latency - baseline) - mad)
+        return anomalous
+
+    def set_step(self, step):
+        self.step = step
+        if self.check_interval and step > 0 and step % self.check_interval == 0:
+            self.check_ranks()
+
+    def check_ranks(self):
+        """
+        Exchange the per-rank totals since the last check with one all-gather, and report a rank that has been the
+        slowest for several consecutive checks. Must be called collectively. Returns the slowest rank of this check
+        or None.
+        """
+        import torch
+        import mcr_dl.comm as dist
+
+        device = dist.get_comm_device()
+        world_size = dist.get_world_size()
+        local = torch.tensor([self.collective_ms, self.calls, self.anomalies], dtype=torch.float64)
+        totals = torch.empty(world_size * local.numel(), dtype=torch.float64, device=device)
+        dist.allgather_fn(totals, local.to(device))
+        totals = totals.view(world_size, local.numel()).cpu()
+        self.collective_ms = 0.0
+        self.calls = 0
+        self.anomalies = 0
+
+        collective_ms = totals[:, _COLLECTIVE_MS]
+        fastest_ms, rank = collective_ms.min(0)
+        rank = rank.item()
+        others_ms = torch.cat([collective_ms[:rank], collective_ms[rank + 1:]])
+        median_ms = others_ms.quantile(0.5).item() if world_size > 1 else 0.0
+        slowest = None
+        # Only comparable when all ranks issued the same collectives
+        if median_ms > 0 and bool((totals[:, _CALLS] == totals[0, _CALLS]).all()):
+            if fastest_ms.item() < (1 - COMMS_ANOMALY_SLOW_RANK_THRESHOLD) * median_ms:
+                slowest = rank
+        if slowest is not None and slowest == self.slow_rank:
+            self.slow_checks += 1
+        else:
+            self.slow_rank = slowest
+            self.slow_checks = 1 if slowest is not None else 0
+        if self.slow_checks == COMMS_ANOMALY_SLOW_RANK_CHECKS:
+            self._report({
+                'type': 'slow_rank',
+                'rank': slowest,
+                'collective_ms': fastest_ms.item(),
+                'median_ms': median_ms,
+                'anomalies': totals[:, _ANOMALIES].tolist(),
+                'checks': self.slow_checks,
+                'step': self.step,
+            })
+        return slowest
+
+    def get_baseline(self, op, size, group=None):
+        """Returns (baseline ms, MAD ms) of an (op, size bucket, group), or None if it was not observed."""
+        state = self.baselines.get((op, size.bit_length(), group))
+        if state is None:
+            return None
+        return state[BASELINE], state[MAD]
@@ -81,12 +81,26 @@ class CommsLogger:
 
     def __init__(self):
         from mcr_dl.constants import COMMS_LOGGER_VERBOSE_DEFAULT, COMMS_LOGGER_DEBUG_DEFAULT, COMMS_LOGGER_PROF_OPS_DEFAULT, COMMS_LOGGER_PROF_ALL_DEFAULT, COMMS_LOGGER_ENABLED_DEFAULT
+        from mcr_dl.constants import COMMS_LOGGER_SAMPLE_RATE_DEFAULT, COMMS_LOGGER_SAMPLE_STEPS_DEFAULT
         self.comms_dict = {}
         self.verbose = COMMS_LOGGER_VERBOSE_DEFAULT
         self.debug = COMMS_LOGGER_DEBUG_DEFAULT
         self.prof_ops = COMMS_LOGGER_PROF_OPS_DEFAULT
         self.prof_all = COMMS_LOGGER_PROF_ALL_DEFAULT
         self.enabled = COMMS_LOGGER_ENABLED_DEFAULT
+        self.sample_rate = COMMS_LOGGER_SAMPLE_RATE_DEFAULT
+        self.sample_steps = COMMS_LOGGER_SAMPLE_STEPS_DEFAULT
+        # Training step set through mcr_dl.set_comms_step()
+        self.step = 0
+        # Calls per (op, message size bucket) so far. Ranks issue the same collectives in the same order, so the
+        # counts and therefore the sampled calls agree across ranks.
+        self.sample_counts = {}
+        # CommsMetrics fed by append() while the metrics exporter is running
+        self.metrics = None
+        # CommsSink fed by append() while the comms log is being written
+        self.sink = None
+        # AnomalyDetector fed by append() while anomaly detection is on
+        self.detector = None
 
     def configure(self, comms_config):
         self.enabled = comms_config.comms_logger_enabled
@@ -95,6 +109,8 @@ class CommsLogger:
             self.debug = comms_config.comms_logger.debug
             self.prof_ops = comms_config.comms_logger.prof_ops
             self.prof_all = comms_config.comms_logger.prof_all
+            self.sample_rate = getattr(comms_config.comms_logger, 'sample_rate', self.sample_rate)
+            self.sample_steps = getattr(comms_config.comms_logger, 'sample_steps', self.sample_steps)
 
     # There are three settings for the op profiler:
     # - Global profiling (profile all comms)
@@ -113,9 +129,31 @@ class CommsLogger:
     def stop_profiling_op(self, op_name_list):
         self.prof_ops = [op for op in self.prof_ops if op not in op_name_list]
 
+    # Sampling caps the profiling overhead, since every profiled op is made blocking:
+    # - Call sampling profiles 1 in sample_rate calls of each (op, message size bucket)
+    # - Step sampling profiles the ops of 1 in sample_steps steps
+    # Returns the number of calls a profiled call stands for, or 0 if the call is not sampled
+    def sample_weight(self, op_name, tensor):
+        if self.sample_steps > 1 and self.step % self.sample_steps != 0:
+            return 0
+        if self.sample_rate <= 1:
+            return self.sample_steps
+        from mcr_dl.utils.dist import tensor_bytes
+        # Power of two size buckets, so ops of very different sizes are sampled independently
+        key = (op_name, tensor_bytes(tensor).bit_length())
+        count = self.sample_counts.get(key, 0)
+        self.sample_counts[key] = count + 1
+        return self.sample_rate * self.sample_steps if count % self.sample_rate == 0 else 0
+
     # Add log entry
-    def append(self, raw_name, record_name, latency, msg_size):
+    def append(self, raw_name, record_name, latency, msg_size, group=None, weight=1):
         algbw, busbw = calc_bw_log(raw_name, msg_size, latency)
+        if self.metrics is not None:
+            self.metrics.record(raw_name, group, msg_size, latency / 1e3, busbw)
+        if self.sink is not None:
+            self.sink.record(raw_name, group, msg_size, latency, algbw, busbw)
+        if self.detector is not None:
+            self.detector.observe(raw_name, group, msg_size, latency)
         if record_name in self.comms_dict.keys():
             # If this comm_op has already been logged with this message size, just add to existing record
             if msg_size in self.comms_dict[record_name].keys():
@@ -123,12 +161,13 @@ class CommsLogger:
                 self.comms_dict[record_name][msg_size][1].append(latency)
                 self.comms_dict[record_name][msg_size][2].append(algbw)
                 self.comms_dict[record_name][msg_size][3].append(busbw)
+                self.comms_dict[record_name][msg_size][4] += weight
             # If this is a new message size for this comm_op, add new record under existing comm_op
             else:
-                self.comms_dict[record_name][msg_size] = [1, [latency], [algbw], [busbw]]
+                self.comms_dict[record_name][msg_size] = [1, [latency], [algbw], [busbw], weight]
         else:
             # Create entirely new record
-            self.comms_dict[record_name] = {msg_size: [1, [latency], [algbw], [busbw]]}
+            self.comms_dict[record_name] = {msg_size: [1, [latency], [algbw], [busbw], weight]}
         # If verbose, print every comm op
         # TODO: Add to tensorboard
         if self.verbose:
@@ -140,19 +179,21 @@ class CommsLogger:
         import torch
         from mcr_dl.utils.timer import trim_mean
         import mcr_dl.comm as dist
-        from mcr_dl.comm.reduce_op import ReduceOp
+        from mcr_dl.reduce_op import ReduceOp
+        # With sampling, counts and total latencies are estimates scaled up from the profiled calls
+        sampled = any(vals[4] != vals[0] for sizes in self.comms_dict.values() for vals in sizes.values())
         if print_log:
             print(
                 f"{'Comm. Op': <20}{'Message Size': <20}{'Count': <20}{'Total Latency(ms)': <20}{'Avg Latency(ms)': <20}{'tput_avg (Gbps)': <20}{'busbw_avg (Gbps)': <20}"
-            )
+                + (f"{'Sampled': <20}" if sampled else ""))
         for record_name in self.comms_dict.keys():
             if print_log:
                 print(record_name)
             for msg_size, vals in sorted(self.comms_dict[record_name].items()):
-                # vals[0] is the count for each msg size
-                count = vals[0]
+                # vals[4] is the estimated count for each msg size, vals[0] the number of profiled calls
+                count = vals[4]
                 # vals[1] is a list of latency records for each msg size
-                total_lat = sum(vals[1])
+                total_lat = sum(vals[1]) * vals[4] / vals[0]
                 # vals[2] and vals[3] are the lists of algbw and busbw, respectively
                 # Get rid of outliers when we print
                 avg_lat = trim_mean(vals[1], 0.1)
@@ -161,7 +202,7 @@ class CommsLogger:
                 if print_log:
                     print(
                         f"{' ': <20}{convert_size(msg_size): <20}{count: <20}{total_lat: <20.2f}{avg_lat: <20.2f}{avg_algbw: <20.2f}{avg_busbw: <20.2f}"
-                    )
+                        + (f"{vals[0]: <20}" if sampled else ""))
 
         if show_straggler:
             if print_log:
@@ -175,14 +216,14 @@ class CommsLogger:
                 if print_log:
                     print(record_name)
                 for msg_size, vals in sorted(self.comms_dict[record_name].items()):
-                    # vals[0] is the count for each msg size
-                    count = vals[0]
+                    # vals[4] is the estimated count for each msg size
+                    count = vals[4]
                     # vals[1] is a list of latency records for each msg size
                     lats = torch.tensor(vals[1])
                     min_lats = torch.tensor(vals[1])
                     dist.all_reduce(min_lats, op=ReduceOp.MIN)
-                    total_lat = min_lats.sum().item()
-                    total_straggler = (lats - min_lats).sum().item()
+                    total_lat = min_lats.sum().item() * vals[4] / vals[0]
+                    total_straggler = (lats - min_lats).sum().item() * vals[4] / vals[0]
                     avg_lat = trim_mean(min_lats.tolist(), 0.1)
                     avg_straggler = trim_mean((lats - min_lats).tolist(), 0.1)
                     if print_log:
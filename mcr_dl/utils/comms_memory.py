@@ -0,0 +1,125 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+MCR-DL Comms Memory
+
+Accounting of the memory communication uses besides the user's tensors: the staging buffers of the object
+collectives, and the scratch buffers backends allocate inside an op (e.g. the MPI ops allocate a receive buffer the
+size of the tensor, the NCCL list all_gather flattens the output list into one buffer). Backends report the latter
+through Backend.scratch_bytes(). Current and peak bytes are tracked in total and per (op, group).
+
+With a budget, ops whose scratch buffers would not fit in what is left of it run in chunks over a flat view of the
+tensor instead, each needing scratch for its chunk only. Chunks are never made smaller than
+COMMS_MEMORY_MIN_CHUNK_BYTES, so the budget is a soft limit for tiny budgets.
+"""
+
+import threading
+import weakref
+from contextlib import contextmanager
+
+from mcr_dl.constants import COMMS_MEMORY_ACCOUNTING, COMMS_MEMORY_BUDGET, COMMS_MEMORY_MIN_CHUNK_BYTES
+
+# Indices into the per (op, group) stats lists
+CURRENT = 0
+PEAK = 1
+ALLOCATED = 2
+
+
+class CommsMemory():
+    """
+    Current and peak bytes allocated by communication, in total and per (op, group).
+
+    Arguments:
+        budget: Optional (int). Bytes that communication may allocate at a time, None for no limit.
+    """
+
+    def __init__(self, budget=COMMS_MEMORY_BUDGET):
+        self.enabled = COMMS_MEMORY_ACCOUNTING or budget is not None
+        self.budget = budget
+        self.current = 0
+        self.peak = 0
+        self.chunked_ops = 0
+        self.stats = {}
+        # Buffers are released from weakref finalizers, which may run on any thread
+        self._lock = threading.Lock()
+
+    def allocate(self, op, group, nbytes):
+        with self._lock:
+            stats = self.stats.get((op, group))
+            if stats is None:
+                stats = [0, 0, 0]
+                self.stats[(op, group)] = stats
+            stats[CURRENT] += nbytes
+            stats[PEAK] = max(stats[PEAK], stats[CURRENT])
+            stats[ALLOCATED] += nbytes
+            self.current += nbytes
+            self.peak = max(self.peak, self.current)
+
+    def release(self, op, group, nbytes):
+        with self._lock:
+            self.stats[(op, group)][CURRENT] -= nbytes
+            self.current -= nbytes
+
+    @contextmanager
+    def reserve(self, op, group, nbytes):
+        """Account ``nbytes`` of scratch memory of ``op`` while the block runs."""
+        self.allocate(op, group, nbytes)
+        try:
+            yield
+        finally:
+            self.release(op, group, nbytes)
+
+    def track(self, tensor, op, group):
+        """Account the memory of ``tensor`` until it is freed. Returns ``tensor``."""
+        nbytes = tensor.numel() * tensor.element_size()
+        self.allocate(op, group, nbytes)
+        weakref.finalize(tensor, self.release, op, group, nbytes)
+        return tensor
+
+    def chunk_numel(self, scratch_bytes, numel):
+        """Elements per chunk of an op that needs ``scratch_bytes`` for ``numel`` elements, so that it fits the budget."""
+        if self.budget is None or self.current + scratch_bytes <= self.budget:
+            return numel
+        bytes_per_element = scratch_bytes / numel
+        available = max(self.budget - self.current, COMMS_MEMORY_MIN_CHUNK_BYTES)
+        return min(numel, max(1, int(available // bytes_per_element)))
+
+    def reset_peak(self):
+        with self._lock:
+            self.peak = self.current
+            for stats in self.stats.values():
+                stats[PEAK] = stats[CURRENT]
+
+    def summary(self):
+        """Lines of a table of the current and peak bytes per (op, group)."""
+        from mcr_dl.utils.comms_metrics import group_label
+        from mcr_dl.utils.comms_logging import convert_size
+
+        budget = 'none' if self.budget is None else convert_size(self.budget)
+        lines = [
+            f"Comm memory: current {convert_size(self.current)}, peak {convert_size(self.peak)}, budget {budget}, "
+            f"chunked ops {self.chunked_ops}",
+            f"{'Op': <20}{'Group': <20}{'Current': <20}{'Peak': <20}{'Allocated': <20}",
+        ]
+        with self._lock:
+            stats = sorted(((op, group_label(group)), list(s)) for (op, group), s in self.stats.items())
+        for (op, group), (current, peak, allocated) in stats:
+            lines.append(f"{op: <20}{group: <20}{convert_size(current): <20}{convert_size(peak): <20}"
+                         f"{convert_size(allocated): <20}")
+        return lines
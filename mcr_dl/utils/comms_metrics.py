@@ -0,0 +1,224 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+MCR-DL Comms Metrics
+
+Live statistics of the ops profiled by the CommsLogger, served over HTTP in the Prometheus text format:
+op counts, bytes, a latency histogram and busbw per (op, group), and straggler time per group.
+
+Every thread that records ops owns a shard of counters, so the hot path only updates its own dict and never takes a
+lock. The shards are merged when the endpoint is scraped. Straggler time needs the latencies of the other ranks, so
+it is computed by sync_comms_metrics(), a collective that gathers every rank's counters: for each group, the time a
+rank spent in its collectives beyond the fastest rank of the group. In aggregated mode rank 0 serves the counters
+of all ranks from the last sync, otherwise every rank serves its own live counters.
+"""
+
+import bisect
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from mcr_dl.constants import COMMS_METRICS_PORT, COMMS_METRICS_ADDR, COMMS_METRICS_LATENCY_BUCKETS
+from mcr_dl.utils.flight_recording import describe_group, P2P_OPS
+
+# Indices into the per (op, group) stats lists
+COUNT = 0
+BYTES = 1
+LATENCY_SUM = 2
+BUSBW_SUM = 3
+BUCKETS = 4
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def group_label(group):
+    ranks = describe_group(group)
+    return ','.join(str(r) for r in ranks) if isinstance(ranks, list) else str(ranks)
+
+
+class CommsMetrics():
+    """
+    Counters of profiled comm ops, sharded per recording thread.
+
+    Arguments:
+        buckets: Optional (list of float). Upper bounds of the latency histogram buckets, in seconds.
+    """
+
+    def __init__(self, buckets=COMMS_METRICS_LATENCY_BUCKETS):
+        self.buckets = sorted(buckets)
+        self._local = threading.local()
+        self._shards = []
+        # Only taken when a thread records its first op
+        self._shards_lock = threading.Lock()
+        # rank -> snapshot and (rank, group) -> straggler seconds, from the last sync()
+        self.synced = {}
+        self.stragglers = {}
+
+    def _new_shard(self):
+        shard = {}
+        with self._shards_lock:
+            self._shards.append(shard)
+        self._local.shard = shard
+        return shard
+
+    def record(self, op, group, size, latency, busbw):
+        """Add one op of ``size`` bytes that took ``latency`` seconds at ``busbw`` Gbps."""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._new_shard()
+        stats = shard.get((op, group))
+        if stats is None:
+            stats = [0, 0, 0.0, 0.0, [0] * (len(self.buckets) + 1)]
+            shard[(op, group)] = stats
+        stats[COUNT] += 1
+        stats[BYTES] += size
+        stats[LATENCY_SUM] += latency
+        stats[BUSBW_SUM] += busbw
+        stats[BUCKETS][bisect.bisect_left(self.buckets, latency)] += 1
+
+    def snapshot(self):
+        """Merge the shards into {(op, group label): stats}. Safe to call from any thread."""
+        merged = {}
+        with self._shards_lock:
+            shards = list(self._shards)
+        labels = {}
+        for shard in shards:
+            # list() copies the items without releasing the GIL, so the recording thread can keep inserting
+            for (op, group), stats in list(shard.items()):
+                if id(group) not in labels:
+                    labels[id(group)] = group_label(group)
+                total = merged.get((op, labels[id(group)]))
+                if total is None:
+                    merged[(op, labels[id(group)])] = [stats[COUNT], stats[BYTES], stats[LATENCY_SUM],
+                                                       stats[BUSBW_SUM], list(stats[BUCKETS])]
+                else:
+                    for field in (COUNT, BYTES, LATENCY_SUM, BUSBW_SUM):
+                        total[field] += stats[field]
+                    total[BUCKETS] = [a + b for a, b in zip(total[BUCKETS], stats[BUCKETS])]
+        return merged
+
+    def sync(self):
+        """Gather the counters of all ranks and compute the straggler time per group. Must be called collectively."""
+        import mcr_dl.comm as dist
+
+        snapshots = []
+        dist.all_gather_object(snapshots, self.snapshot())
+        # A rank's latency sum of an (op, group) beyond the smallest one of the group is time spent waiting
+        fastest = {}
+        for snapshot in snapshots:
+            for key, stats in snapshot.items():
+                if key[0] in P2P_OPS:
+                    continue
+                fastest[key] = min(fastest.get(key, stats[LATENCY_SUM]), stats[LATENCY_SUM])
+        stragglers = {}
+        for rank, snapshot in enumerate(snapshots):
+            for (op, group), stats in snapshot.items():
+                if op in P2P_OPS:
+                    continue
+                stragglers[(rank, group)] = stragglers.get(
+                    (rank, group), 0.0) + stats[LATENCY_SUM] - fastest[(op, group)]
+        self.synced = dict(enumerate(snapshots))
+        self.stragglers = stragglers
+
+    def render(self, rank, aggregate=False):
+        """Prometheus text exposition of the live counters of ``rank``, or of all ranks from the last sync()."""
+        snapshots = dict(self.synced) if aggregate else {}
+        snapshots[rank] = self.snapshot()
+        series = {'ops': [], 'bytes': [], 'latency': [], 'busbw': []}
+        for r, snapshot in sorted(snapshots.items()):
+            for (op, group), stats in sorted(snapshot.items()):
+                labels = f'rank="{r}",op="{op}",group="{group}"'
+                series['ops'].append(f'mcr_dl_comm_ops_total{{{labels}}} {stats[COUNT]}')
+                series['bytes'].append(f'mcr_dl_comm_bytes_total{{{labels}}} {stats[BYTES]}')
+                cumulative = 0
+                for bound, count in zip(self.buckets + ['+Inf'], stats[BUCKETS]):
+                    cumulative += count
+                    series['latency'].append(f'mcr_dl_comm_latency_seconds_bucket{{{labels},le="{bound}"}} '
+                                             f'{cumulative}')
+                series['latency'].append(f'mcr_dl_comm_latency_seconds_sum{{{labels}}} {stats[LATENCY_SUM]}')
+                series['latency'].append(f'mcr_dl_comm_latency_seconds_count{{{labels}}} {stats[COUNT]}')
+                series['busbw'].append(f'mcr_dl_comm_busbw_gbps{{{labels}}} {stats[BUSBW_SUM] / stats[COUNT]}')
+
+        series['straggler'] = [
+            f'mcr_dl_comm_straggler_seconds{{rank="{r}",group="{group}"}} {seconds}'
+            for (r, group), seconds in sorted(self.stragglers.items()) if aggregate or r == rank
+        ]
+
+        families = [
+            ('mcr_dl_comm_ops_total', 'counter', 'Number of profiled comm ops.', 'ops'),
+            ('mcr_dl_comm_bytes_total', 'counter', 'Message bytes of profiled comm ops.', 'bytes'),
+            ('mcr_dl_comm_latency_seconds', 'histogram', 'Latency of profiled comm ops.', 'latency'),
+            ('mcr_dl_comm_busbw_gbps', 'gauge', 'Average bus bandwidth of profiled comm ops.', 'busbw'),
+            ('mcr_dl_comm_straggler_seconds', 'gauge',
+             'Time spent in collectives beyond the fastest rank of the group, as of the last sync.', 'straggler'),
+        ]
+        lines = []
+        for name, kind, help_text, key in families:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(series[key])
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsExporter():
+    """
+    HTTP endpoint serving CommsMetrics.render() at /metrics from a daemon thread.
+
+    Arguments:
+        metrics: CommsMetrics to serve
+        rank: global rank of the calling process
+        port: Optional (int). Port to listen on, 0 picks a free one.
+        addr: Optional (str). Address to bind to.
+        aggregate: Optional (bool). Serve the counters of all ranks from the last sync.
+    """
+
+    def __init__(self, metrics, rank, port=COMMS_METRICS_PORT, addr=COMMS_METRICS_ADDR, aggregate=False):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = exporter.metrics.render(exporter.rank, exporter.aggregate).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrapes are periodic, don't log every request
+                pass
+
+        self.metrics = metrics
+        self.rank = rank
+        self.aggregate = aggregate
+        self.server = ThreadingHTTPServer((addr, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       name='mcr_dl_metrics_exporter',
+                                       daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
@@ -0,0 +1,254 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+MCR-DL Comms Sink
+
+Structured log of the ops profiled by the CommsLogger, written as JSON lines or CSV to
+<log dir>/comms_rank<rank>-<segment>.jsonl (or .csv, optionally gzipped). Every record holds
+
+    step, time, rank, op, group, size, count, latency_ms, algbw_gbps, busbw_gbps
+
+either for a single op (count = 1), or with ``interval`` set, the averages over all ops of the same (op, group, size)
+within an interval of that many seconds. The hot path only appends a tuple to a deque. A writer thread drains it in
+batches, formats the records and issues one write per batch, and starts a new segment file once the current one
+reaches ``max_bytes``. load_comms_log() reads the files back into a NumPy structured array.
+"""
+
+import io
+import os
+import csv
+import glob
+import gzip
+import json
+import time
+import atexit
+import threading
+from collections import deque
+
+import numpy as np
+
+from mcr_dl.constants import (COMMS_SINK_DIR, COMMS_SINK_FORMAT, COMMS_SINK_MAX_BYTES, COMMS_SINK_FLUSH_RECORDS,
+                              COMMS_SINK_FLUSH_INTERVAL)
+from mcr_dl.utils.comms_metrics import group_label
+
+FIELDS = ('step', 'time', 'rank', 'op', 'group', 'size', 'count', 'latency_ms', 'algbw_gbps', 'busbw_gbps')
+FORMATS = ('jsonl', 'csv')
+
+
+class CommsSink():
+    """
+    Buffered per-rank writer of comms log records.
+
+    Arguments:
+        log_dir: Optional (str). Directory the segment files are written to.
+        format: Optional (str). 'jsonl' or 'csv'.
+        interval: Optional (float). Write averages over intervals of this many seconds instead of every op.
+        max_bytes: Optional (int). Size at which a new segment file is started.
+        compress: Optional (bool). Write gzip streams.
+        flush_records: Optional (int). Number of pending records that wakes up the writer thread.
+        flush_interval: Optional (float). Longest time in seconds records stay pending.
+    """
+
+    def __init__(self,
+                 log_dir=COMMS_SINK_DIR,
+                 format=COMMS_SINK_FORMAT,
+                 interval=None,
+                 max_bytes=COMMS_SINK_MAX_BYTES,
+                 compress=False,
+                 flush_records=COMMS_SINK_FLUSH_RECORDS,
+                 flush_interval=COMMS_SINK_FLUSH_INTERVAL):
+        assert format in FORMATS, f'Unknown comms log format {format}, expected one of {FORMATS}'
+        self.log_dir = log_dir
+        self.format = format
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval if interval is None else min(flush_interval, interval)
+        self.step = 0
+        self.rank = 0
+
+        self._pending = deque()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._writer = None
+        self._labels = {}
+        # (op, group label, size) -> [count, latency sum, algbw sum, busbw sum, last step] of the current interval
+        self._aggregate = {}
+        self._interval_end = None
+
+        self._segment = 0
+        self._raw = None
+        self._file = None
+
+    def start(self):
+        import mcr_dl.comm as dist
+
+        self.rank = dist.get_rank() if dist.is_initialized() else int(os.environ.get('RANK', '0'))
+        os.makedirs(self.log_dir, exist_ok=True)
+        # Segments of an earlier run of this rank would be mixed up with the new ones
+        for path in glob.glob(os.path.join(self.log_dir, f'comms_rank{self.rank}-*')):
+            os.remove(path)
+        self._segment = 0
+        if self.interval is not None:
+            self._interval_end = time.time() + self.interval
+        self._stopping = False
+        self._writer = threading.Thread(target=self._writer_loop, name='mcr_dl_comms_sink_writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.stop)
+
+    def record(self, op, group, size, latency, algbw, busbw):
+        """Queue one op that took ``latency`` ms. Never blocks on I/O."""
+        pending = self._pending
+        pending.append((self.step, time.time(), op, group, size, latency, algbw, busbw))
+        if len(pending) >= self.flush_records:
+            self._wakeup.set()
+
+    def stop(self):
+        """Write all pending records and close the current segment."""
+        if self._writer is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        self._writer.join()
+        self._writer = None
+        atexit.unregister(self.stop)
+
+    def _writer_loop(self):
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._flush()
+        self._flush(final=True)
+        self._close_segment()
+
+    def _label(self, group):
+        label = self._labels.get(group)
+        if label is None:
+            label = group_label(group)
+            self._labels[group] = label
+        return label
+
+    def _flush(self, final=False):
+        # popleft() is atomic, so ops can keep being recorded while the batch is drained
+        pending = self._pending
+        batch = [pending.popleft() for _ in range(len(pending))]
+        if self.interval is None:
+            rows = [(step, timestamp, self.rank, op, self._label(group), size, 1, latency, algbw, busbw)
+                    for step, timestamp, op, group, size, latency, algbw, busbw in batch]
+        else:
+            rows = self._aggregate_interval(batch, final)
+        if rows:
+            self._write(rows)
+
+    def _aggregate_interval(self, batch, final):
+        aggregate = self._aggregate
+        for step, timestamp, op, group, size, latency, algbw, busbw in batch:
+            key = (op, self._label(group), size)
+            stats = aggregate.get(key)
+            if stats is None:
+                aggregate[key] = [1, latency, algbw, busbw, step]
+            else:
+                stats[0] += 1
+                stats[1] += latency
+                stats[2] += algbw
+                stats[3] += busbw
+                stats[4] = step
+        now = time.time()
+        if not final and now < self._interval_end:
+            return []
+        end = self._interval_end if not final else now
+        # Skip intervals in which no op was recorded
+        self._interval_end = max(self._interval_end + self.interval, now)
+        self._aggregate = {}
+        return [(step, end, self.rank, op, group, size, count, latency / count, algbw / count, busbw / count)
+                for (op, group, size), (count, latency, algbw, busbw, step) in sorted(aggregate.items())]
+
+    def _segment_path(self):
+        name = f'comms_rank{self.rank}-{self._segment:05d}.{self.format}'
+        return os.path.join(self.log_dir, name + '.gz' if self.compress else name)
+
+    def _open_segment(self):
+        self._raw = open(self._segment_path(), 'wb')
+        stream = gzip.GzipFile(fileobj=self._raw, mode='wb') if self.compress else self._raw
+        self._file = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+        if self.format == 'csv':
+            self._file.write(','.join(FIELDS) + '\r\n')
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        # Closing the text wrapper closes the gzip stream, but not the file underneath it
+        self._file.close()
+        if not self._raw.closed:
+            self._raw.close()
+        self._file = None
+        self._raw = None
+
+    def _write(self, rows):
+        text = io.StringIO()
+        if self.format == 'jsonl':
+            for row in rows:
+                text.write(json.dumps(dict(zip(FIELDS, row))))
+                text.write('\n')
+        else:
+            csv.writer(text).writerows(rows)
+        if self._file is None:
+            self._open_segment()
+        self._file.write(text.getvalue())
+        self._file.flush()
+        if self._raw.tell() >= self.max_bytes:
+            self._close_segment()
+            self._segment += 1
+
+
+def _open_log(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def load_comms_log(path):
+    """
+    Read comms log records into a NumPy structured array with one field per entry of FIELDS. ``path`` is a single
+    segment file, or a log directory, in which case the segments of all ranks are read.
+    """
+    if os.path.isdir(path):
+        paths = sorted(glob.glob(os.path.join(path, 'comms_rank*-*')))
+    else:
+        paths = [path]
+    rows = []
+    for segment in paths:
+        with _open_log(segment) as f:
+            if '.jsonl' in os.path.basename(segment):
+                records = (json.loads(line) for line in f if line.strip())
+            else:
+                records = csv.DictReader(f)
+            rows.extend(tuple(record[field] for field in FIELDS) for record in records)
+    op_len = max((len(row[3]) for row in rows), default=1)
+    group_len = max((len(row[4]) for row in rows), default=1)
+    dtype = np.dtype([('step', np.int64), ('time', np.float64), ('rank', np.int32), ('op', f'U{op_len}'),
+                      ('group', f'U{group_len}'), ('size', np.int64), ('count', np.int64),
+                      ('latency_ms', np.float64), ('algbw_gbps', np.float64), ('busbw_gbps', np.float64)])
+    log = np.empty(len(rows), dtype=dtype)
+    if rows:
+        # CSV fields are strings, casting whole columns converts them
+        for field, column in zip(FIELDS, zip(*rows)):
+            log[field] = np.asarray(column).astype(dtype[field])
+    return log
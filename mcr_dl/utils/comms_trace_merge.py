@@ -0,0 +1,99 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Merges the per-rank comms traces written by mcr_dl.export_comms_trace() into one Chrome trace.
+
+    python -m mcr_dl.utils.comms_trace_merge <trace dir> -o merged_trace.json
+
+Each rank's timestamps are moved onto rank 0's clock with the offsets measured when the trace was started and
+exported. Between two measurements the offset is interpolated linearly, which also corrects clock drift; outside
+of them the nearest measurement is used. The merged timeline starts at 0.
+"""
+
+import os
+import sys
+import json
+import glob
+import argparse
+
+import numpy as np
+
+
+def load_traces(trace_dir):
+    """Returns {rank: trace} for all trace_rank<rank>.json files in ``trace_dir``."""
+    traces = {}
+    for path in glob.glob(os.path.join(trace_dir, 'trace_rank*.json')):
+        with open(path, 'r') as f:
+            trace = json.load(f)
+        traces[trace['mcr_dl']['rank']] = trace
+    return traces
+
+
+def clock_offset_us(clock_sync, ts_us):
+    """Offset to rank 0's clock, in us, at local time ``ts_us`` (scalar or array)."""
+    if not clock_sync:
+        return np.zeros_like(ts_us, dtype=np.float64)
+    local = np.array([s['local_ns'] for s in clock_sync], dtype=np.float64) / 1e3
+    offset = np.array([s['offset_ns'] for s in clock_sync], dtype=np.float64) / 1e3
+    order = np.argsort(local)
+    return np.interp(ts_us, local[order], offset[order])
+
+
+def merge_traces(traces):
+    """Put the events of all ranks on rank 0's clock and return one Chrome trace dict."""
+    merged = []
+    for rank, trace in sorted(traces.items()):
+        events = trace['traceEvents']
+        timed = [e for e in events if 'ts' in e]
+        if timed:
+            ts = np.array([e['ts'] for e in timed], dtype=np.float64)
+            corrected = ts - clock_offset_us(trace['mcr_dl']['clock_sync'], ts)
+            for event, t in zip(timed, corrected.tolist()):
+                event['ts'] = t
+        merged.extend(events)
+
+    timed = [e for e in merged if 'ts' in e]
+    if timed:
+        start = min(e['ts'] for e in timed)
+        for event in timed:
+            event['ts'] -= start
+    metadata = {rank: trace['mcr_dl'] for rank, trace in sorted(traces.items())}
+    return {'traceEvents': merged, 'displayTimeUnit': 'ms', 'mcr_dl': metadata}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge per-rank MCR-DL comms traces into one Chrome trace')
+    parser.add_argument('trace_dir', type=str)
+    parser.add_argument('-o', '--output', type=str, default=None, help='Default: <trace_dir>/merged_trace.json')
+    args = parser.parse_args()
+
+    traces = load_traces(args.trace_dir)
+    if not traces:
+        print(f'no traces found in {args.trace_dir}')
+        return 1
+    output = args.output or os.path.join(args.trace_dir, 'merged_trace.json')
+    with open(output, 'w') as f:
+        json.dump(merge_traces(traces), f)
+    dropped = sum(t['mcr_dl']['dropped_events'] for t in traces.values())
+    print(f'merged {len(traces)} ranks into {output}' + (f' ({dropped} events were dropped)' if dropped else ''))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
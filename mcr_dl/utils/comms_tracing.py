@@ -0,0 +1,262 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+MCR-DL Comms Tracing
+
+Timeline of the profiled comm ops of a rank, exported in the Chrome trace event format (chrome://tracing, Perfetto).
+While tracing is on, timed_op records (begin, end, size, op, group, stream) of every profiled op into a
+preallocated NumPy buffer. Op names and groups are interned, so a record is a single row store and nothing is
+allocated per op. Full buffers are swapped with a spare one and handed to a writer thread, which spills them to
+<trace dir>/trace_rank<rank>.bin. Exporting converts the spill file into trace_rank<rank>.json, also on the writer
+thread.
+
+Timestamps come from the monotonic perf counter of each process. When tracing starts and on every collective
+export, the ranks estimate the offset of their clock to rank 0's with a few barrier rounds and store it in the
+trace, so the traces of all ranks can be put on one timeline with
+
+    python -m mcr_dl.utils.comms_trace_merge <trace dir> -o merged_trace.json
+"""
+
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+
+import numpy as np
+
+from mcr_dl.constants import COMMS_TRACE_DIR, COMMS_TRACE_BUFFER_SIZE, COMMS_TRACE_CLOCK_SYNC_ROUNDS
+
+TRACE_DTYPE = np.dtype([('begin_ns', np.int64), ('end_ns', np.int64), ('size', np.int64), ('op', np.int32),
+                        ('group', np.int32), ('stream', np.int64)])
+
+_now_ns = time.perf_counter_ns
+
+
+def current_stream_id():
+    import torch
+    # Streams only exist once CUDA is in use, host-side ops all go to stream 0
+    if torch.cuda.is_initialized():
+        return torch.cuda.current_stream().cuda_stream
+    return 0
+
+
+def measure_clock_offset(rounds=COMMS_TRACE_CLOCK_SYNC_ROUNDS):
+    """
+    Estimate the offset of this rank's perf counter to rank 0's, in ns. Every round, all ranks leave a barrier at
+    about the same time and exchange their clock readings. The median over rounds filters out rounds in which a rank
+    got descheduled. Must be called collectively by all ranks.
+
+    Returns (local time in ns, offset in ns), so that ``rank 0 time = local time - offset``.
+    """
+    import torch
+    import mcr_dl.comm as dist
+
+    device = dist.get_comm_device()
+    world_size = dist.get_world_size()
+    readings = torch.empty(rounds, dtype=torch.int64)
+    for i in range(rounds):
+        dist.barrier()
+        readings[i] = _now_ns()
+    local = readings.to(device)
+    all_readings = torch.empty(world_size * rounds, dtype=torch.int64, device=device)
+    dist.allgather_fn(all_readings, local)
+    all_readings = all_readings.view(world_size, rounds).cpu()
+    offset = (all_readings[dist.get_rank()] - all_readings[0]).median().item()
+    return readings[-1].item(), offset
+
+
+class CommsTracer():
+    """
+    Per-rank buffer of traced comm ops.
+
+    Arguments:
+        buffer_size: Optional (int). Number of events per buffer. Two buffers are preallocated.
+    """
+
+    def __init__(self, buffer_size=COMMS_TRACE_BUFFER_SIZE):
+        self.enabled = False
+        self.buffer_size = buffer_size
+        self.trace_dir = COMMS_TRACE_DIR
+        self.rank = 0
+        self.dropped = 0
+
+        self._buffer = None
+        self._spare = None
+        self._count = 0
+        self._op_ids = {}
+        self._op_names = []
+        self._group_ids = {}
+        self._groups = []
+        self._clock_sync = []
+
+        self._queue = queue.Queue()
+        self._writer = None
+        self._atexit_registered = False
+
+    def start(self, trace_dir=COMMS_TRACE_DIR, sync_clocks=True):
+        """Start tracing. With ``sync_clocks``, it must be called collectively by all ranks."""
+        import mcr_dl.comm as dist
+
+        self.enabled = False
+        if self._buffer is None:
+            self._buffer = np.zeros(self.buffer_size, dtype=TRACE_DTYPE)
+            self._spare = np.zeros(self.buffer_size, dtype=TRACE_DTYPE)
+        self.trace_dir = trace_dir
+        self.rank = dist.get_rank() if dist.is_initialized() else int(os.environ.get('RANK', '0'))
+        os.makedirs(trace_dir, exist_ok=True)
+        # Events of an earlier trace are discarded
+        self._queue.join()
+        self._count = 0
+        self.dropped = 0
+        self._clock_sync = []
+        if os.path.exists(self.spill_path()):
+            os.remove(self.spill_path())
+        if sync_clocks:
+            self._clock_sync.append(measure_clock_offset())
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._writer_loop, name='mcr_dl_comms_trace_writer', daemon=True)
+            self._writer.start()
+        if not self._atexit_registered:
+            atexit.register(self._export_at_exit)
+            self._atexit_registered = True
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def spill_path(self):
+        return os.path.join(self.trace_dir, f'trace_rank{self.rank}.bin')
+
+    def trace_path(self):
+        return os.path.join(self.trace_dir, f'trace_rank{self.rank}.json')
+
+    def now(self):
+        return _now_ns()
+
+    @staticmethod
+    def _intern(key, ids, values):
+        index = len(values)
+        ids[key] = index
+        values.append(key)
+        return index
+
+    def record(self, op, group, size, begin_ns, end_ns, stream=0):
+        """Record one op. Never blocks: if the writer falls behind, the event is dropped and counted."""
+        count = self._count
+        if count == self.buffer_size:
+            if not self._hand_off():
+                self.dropped += 1
+                return
+            count = 0
+        op_id = self._op_ids.get(op)
+        if op_id is None:
+            op_id = self._intern(op, self._op_ids, self._op_names)
+        group_id = self._group_ids.get(group)
+        if group_id is None:
+            group_id = self._intern(group, self._group_ids, self._groups)
+        self._buffer[count] = (begin_ns, end_ns, size, op_id, group_id, stream)
+        self._count = count + 1
+
+    def _hand_off(self):
+        # Swap the active buffer with the spare one and queue it for writing
+        spare = self._spare
+        if spare is None:
+            return False
+        self._spare = None
+        self._queue.put(('spill', self._buffer, self._count))
+        self._buffer = spare
+        self._count = 0
+        return True
+
+    def _writer_loop(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task[0] == 'spill':
+                    _, buffer, count = task
+                    with open(self.spill_path(), 'ab') as f:
+                        f.write(buffer[:count].tobytes())
+                    self._spare = buffer
+                elif task[0] == 'export':
+                    self._write_trace(*task[1:])
+            finally:
+                self._queue.task_done()
+
+    def export(self, sync_clocks=True, blocking=True):
+        """
+        Write the events recorded so far to trace_path(). With ``sync_clocks``, the clock offset is measured again
+        to correct for drift, and the call must be made collectively by all ranks. Returns the trace path.
+        """
+        import mcr_dl.comm as dist
+
+        if self._buffer is None:
+            return None
+        enabled, self.enabled = self.enabled, False
+        if sync_clocks:
+            self._clock_sync.append(measure_clock_offset())
+        # Wait for the spare buffer to come back, then spill the partially filled active buffer
+        self._queue.join()
+        if self._count > 0:
+            self._hand_off()
+        metadata = {
+            'rank': self.rank,
+            'world_size': dist.get_world_size() if dist.is_initialized() else int(os.environ.get('WORLD_SIZE', '1')),
+            'clock_sync': [{'local_ns': local, 'offset_ns': offset} for local, offset in self._clock_sync],
+            'dropped_events': self.dropped,
+        }
+        from mcr_dl.utils.flight_recording import describe_group
+        groups = [describe_group(group) for group in self._groups]
+        self._queue.put(('export', list(self._op_names), groups, metadata))
+        if blocking:
+            self._queue.join()
+        self.enabled = enabled
+        return self.trace_path()
+
+    def _write_trace(self, op_names, groups, metadata):
+        if os.path.exists(self.spill_path()):
+            events = np.fromfile(self.spill_path(), dtype=TRACE_DTYPE)
+        else:
+            events = np.zeros(0, dtype=TRACE_DTYPE)
+        rank = metadata['rank']
+        trace_events = [{'name': 'process_name', 'ph': 'M', 'pid': rank, 'args': {'name': f'rank {rank}'}}]
+        for begin_ns, end_ns, size, op, group, stream in events.tolist():
+            trace_events.append({
+                'name': op_names[op],
+                'cat': 'comm',
+                'ph': 'X',
+                'ts': begin_ns / 1e3,
+                'dur': (end_ns - begin_ns) / 1e3,
+                'pid': rank,
+                'tid': stream,
+                'args': {
+                    'bytes': size,
+                    'group': groups[group],
+                },
+            })
+        path = self.trace_path()
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms', 'mcr_dl': metadata}, f)
+        os.replace(path + '.tmp', path)
+
+    def _export_at_exit(self):
+        # Collectives can not be relied on at interpreter exit, so the last clock sync is reused
+        if self.enabled:
+            self.export(sync_clocks=False)
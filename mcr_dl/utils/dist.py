@@ -139,6 +139,15 @@ def get_msg_size_from_args(func, *args, **kwargs):
             return tensor_arg.element_size() * tensor_arg.nelement()
 
 
+def tensor_bytes(tensor):
+    # Cheaper than get_msg_size_from_args() when the tensor arg has already been looked up
+    if tensor is None:
+        return 0
+    if isinstance(tensor, (list, tuple)):
+        return sum(t.element_size() * t.nelement() for t in tensor)
+    return tensor.element_size() * tensor.nelement()
+
+
 def get_debug_log_name(func_args, debug):
     if debug:
         return func_args['log_name'] + ' | [Caller Func: ' + get_caller_func() + ']'
@@ -0,0 +1,131 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Offline comparison of MCR-DL flight recorder dumps (see mcr_dl.utils.flight_recording).
+
+    python -m mcr_dl.utils.flight_recorder_diff <dump dir>
+
+Collectives are matched across ranks by (group, per-group sequence number). Prints ranks that never entered or
+stopped before a collective the other ranks of the group entered, ranks stuck in a collective, and the first
+collective whose op, dtype or (where required) shape differs across ranks. Exits with 1 if anything was found.
+"""
+
+import os
+import sys
+import json
+import glob
+import argparse
+
+from mcr_dl.constants import FLIGHT_RECORDER_DUMP_DIR
+
+# Collectives whose tensor must have the same shape on every rank
+SAME_SHAPE_OPS = frozenset(['all_reduce', 'inference_all_reduce', 'broadcast', 'reduce'])
+
+
+def load_dumps(dump_dir):
+    """Returns {rank: dump} for all rank_<rank>.json files in ``dump_dir``."""
+    dumps = {}
+    for path in glob.glob(os.path.join(dump_dir, 'rank_*.json')):
+        with open(path, 'r') as f:
+            record = json.load(f)
+        dumps[record['rank']] = record
+    return dumps
+
+
+def _describe_entry(entry):
+    return f"{entry['op']}(shape={entry['shape']}, dtype={entry['dtype']}, state={entry['state']})"
+
+
+def diff_dumps(dumps):
+    """Compare the dumps of all ranks and return a list of findings, empty if every rank agrees."""
+    findings = []
+    if not dumps:
+        return ['no flight recorder dumps found']
+    world_size = max(d['world_size'] for d in dumps.values())
+    missing = sorted(set(range(world_size)) - set(dumps))
+    if missing:
+        findings.append(f'no dump from ranks {missing}')
+
+    # group name -> rank -> group seq -> entry
+    groups = {}
+    for rank, record in dumps.items():
+        for entry in record['entries']:
+            if entry['group_seq'] < 0:
+                continue
+            key = json.dumps(entry['group'])
+            groups.setdefault(key, {}).setdefault(rank, {})[entry['group_seq']] = entry
+
+    for key, per_rank in sorted(groups.items()):
+        group = json.loads(key)
+        expected = set(range(world_size)) if group == 'world' else set(group) if isinstance(group, list) else set()
+        absent = sorted((expected & set(dumps)) - set(per_rank))
+        if absent:
+            findings.append(f'group {group}: ranks {absent} never entered a collective on this group')
+
+        last = {rank: max(seqs) for rank, seqs in per_rank.items()}
+        furthest = max(last.values())
+        for rank, seq in sorted(last.items()):
+            entry = per_rank[rank][seq]
+            if seq < furthest:
+                ahead = sorted(r for r, s in last.items() if s > seq)
+                ahead_entry = per_rank[ahead[0]].get(seq + 1)
+                ahead_op = _describe_entry(ahead_entry) if ahead_entry is not None else ''
+                findings.append(f'group {group}: rank {rank} stopped at group seq {seq} {_describe_entry(entry)} '
+                                f'while ranks {ahead} entered group seq {seq + 1} {ahead_op}')
+            elif entry['state'] == 'pending':
+                findings.append(f'group {group}: rank {rank} is stuck in group seq {seq} {_describe_entry(entry)}')
+
+        # Only the sequence numbers still held in the ring buffer of every rank can be compared
+        first_common = max(min(seqs) for seqs in per_rank.values())
+        last_common = min(last.values())
+        for seq in range(first_common, last_common + 1):
+            entries = {rank: seqs[seq] for rank, seqs in per_rank.items() if seq in seqs}
+            signatures = {}
+            for rank, entry in entries.items():
+                signature = (entry['op'], entry['dtype'])
+                if entry['op'] in SAME_SHAPE_OPS:
+                    signature += (str(entry['shape']), )
+                signatures.setdefault(signature, []).append(rank)
+            if len(signatures) > 1:
+                details = '; '.join(f'ranks {sorted(ranks)}: {_describe_entry(entries[ranks[0]])}'
+                                    for ranks in signatures.values())
+                findings.append(f'group {group}: mismatched collective at group seq {seq}: {details}')
+                break
+    return findings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find mismatched or missing ranks in MCR-DL flight recorder dumps')
+    parser.add_argument('dump_dir', type=str, nargs='?', default=FLIGHT_RECORDER_DUMP_DIR)
+    args = parser.parse_args()
+
+    dumps = load_dumps(args.dump_dir)
+    for rank, record in sorted(dumps.items()):
+        if record['reason']:
+            print(f"rank {rank} ({record['host']}): {record['reason']}")
+    findings = diff_dumps(dumps)
+    for finding in findings:
+        print(finding)
+    if not findings:
+        print(f'all {len(dumps)} dumps agree')
+    return 1 if findings else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,271 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+MCR-DL Flight Recorder
+
+Always-on record of the most recent communication ops of a rank, written by timed_op for every op whether or not
+profiling is enabled. Every op gets a global sequence number, a per-group sequence number (collectives only), the
+shape and dtype of its tensor and its start/end wall clock time. The fields live in preallocated lists indexed by
+``seq & mask``, so recording an op is a handful of list stores and never allocates a new entry.
+
+A watchdog thread reports ops that have been pending for longer than the process group timeout and dumps the
+buffer to <dump dir>/rank_<rank>.json. It also touches a trigger file in the dump directory, which makes the
+watchdogs of all other ranks sharing that directory dump their buffers too, including the ranks that are not stuck.
+The dumps are compared offline with
+
+    python -m mcr_dl.utils.flight_recorder_diff <dump dir>
+
+which reports ranks that are missing from a collective, ranks stuck in one and collectives that do not match across
+ranks. Note that an op is marked done when its call returns, which for async ops and ops enqueued on a stream is
+before the communication has completed.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import inspect
+import itertools
+import threading
+
+from mcr_dl.constants import (FLIGHT_RECORDER_ENABLED, FLIGHT_RECORDER_CAPACITY, FLIGHT_RECORDER_DUMP_DIR,
+                              FLIGHT_RECORDER_POLL_INTERVAL)
+
+STATE_PENDING = 1
+STATE_DONE = 2
+STATE_FAILED = 3
+STATE_NAMES = {STATE_PENDING: 'pending', STATE_DONE: 'done', STATE_FAILED: 'failed'}
+
+# Point-to-point ops are not matched across all ranks of a group, so they get no per-group sequence number
+P2P_OPS = frozenset(['send', 'recv', 'isend', 'irecv'])
+
+TRIGGER_FILE = 'dump_trigger'
+
+_time_ns = time.time_ns
+
+# Position used for arguments a function does not have, so ``len(args) > position`` is always False
+_NO_POSITION = sys.maxsize
+
+
+def get_op_arg_positions(func):
+    """Returns (tensor arg name, tensor arg position, group arg position) of a comm op, resolved once per op."""
+    from mcr_dl.utils.dist import get_tensor_position
+
+    params = list(inspect.signature(func).parameters)
+    tensor_position = get_tensor_position(func)
+    tensor_name = params[tensor_position] if tensor_position > -1 else None
+    tensor_position = tensor_position if tensor_position > -1 else _NO_POSITION
+    group_position = params.index('group') if 'group' in params else _NO_POSITION
+    return tensor_name, tensor_position, group_position
+
+
+def _get_rank():
+    import mcr_dl.comm as dist
+    if dist.is_initialized():
+        return dist.get_rank()
+    return int(os.environ.get('RANK', '0'))
+
+
+def describe_group(group):
+    # Global ranks of a group, which unlike the group object are comparable across ranks
+    import mcr_dl.comm as dist
+    if group is None:
+        return 'world'
+    for ranks, cached_group in dist.subgroup_cache.items():
+        if cached_group is group:
+            return list(ranks)
+    try:
+        return dist.get_all_ranks_from_group(group)
+    except Exception:
+        return repr(group)
+
+
+class FlightRecorder():
+    """
+    Fixed-size ring buffer of the most recent comm ops of this rank.
+
+    Arguments:
+        capacity: Optional (int). Number of ops kept, rounded up to a power of 2.
+        enabled: Optional (bool). If False, timed_op does not record anything.
+    """
+
+    def __init__(self, capacity=FLIGHT_RECORDER_CAPACITY, enabled=FLIGHT_RECORDER_ENABLED):
+        self.enabled = enabled
+        self.capacity = 1 << max(capacity - 1, 0).bit_length()
+        self.mask = self.capacity - 1
+        self._counter = itertools.count()
+        self._group_seqs = {}
+
+        # One (seq, group seq, op, group, shape, dtype, start time) tuple per slot, written with a single store
+        self.records = [None] * self.capacity
+        # 0 while an op is pending, its end time once it returned, the negated end time if it raised
+        self.end_times = [0] * self.capacity
+
+        self._watchdog = None
+        self._stop_event = threading.Event()
+
+    def start(self, op, group, tensor, collective=True):
+        """Record the start of ``op`` and return its sequence number. Must be followed by end()."""
+        seq = next(self._counter)
+        if collective:
+            group_seq = self._group_seqs.get(group, 0)
+            self._group_seqs[group] = group_seq + 1
+        else:
+            group_seq = -1
+        if tensor.__class__ is list:
+            tensor = tensor[0] if tensor else None
+        slot = seq & self.mask
+        if tensor is None:
+            self.records[slot] = (seq, group_seq, op, group, None, None, _time_ns())
+        else:
+            self.records[slot] = (seq, group_seq, op, group, tensor.shape, tensor.dtype, _time_ns())
+        # Reset after the record is written, so the watchdog never sees the previous op of the slot as pending
+        self.end_times[slot] = 0
+        return seq
+
+    def end(self, seq):
+        end_time = _time_ns()
+        slot = seq & self.mask
+        # The slot may have been reused if more than ``capacity`` ops were started since
+        if self.records[slot][0] == seq:
+            self.end_times[slot] = end_time if self.end_times[slot] == 0 else -end_time
+
+    def fail(self, seq):
+        slot = seq & self.mask
+        if self.records[slot][0] == seq:
+            self.end_times[slot] = -1
+
+    def is_pending(self, seq):
+        slot = seq & self.mask
+        record = self.records[slot]
+        return record is not None and record[0] == seq and self.end_times[slot] == 0
+
+    def get_state(self, slot):
+        end_time = self.end_times[slot]
+        return STATE_PENDING if end_time == 0 else STATE_DONE if end_time > 0 else STATE_FAILED
+
+    def entries(self):
+        """Recorded ops, oldest first, as a list of dicts."""
+        slots = sorted((s for s in range(self.capacity) if self.records[s] is not None),
+                       key=lambda s: self.records[s][0])
+        group_names = {}
+        entries = []
+        for s in slots:
+            seq, group_seq, op, group, shape, dtype, start_time = self.records[s]
+            if id(group) not in group_names:
+                group_names[id(group)] = describe_group(group)
+            entries.append({
+                'seq': seq,
+                'group_seq': group_seq,
+                'op': op,
+                'group': group_names[id(group)],
+                'shape': None if shape is None else list(shape),
+                'dtype': None if dtype is None else str(dtype),
+                'start_time_ns': start_time,
+                'end_time_ns': abs(self.end_times[s]),
+                'state': STATE_NAMES[self.get_state(s)],
+            })
+        return entries
+
+    def get_stuck_op(self, deadline_ns):
+        """Returns the slot of the oldest op pending since before ``deadline_ns``, or None."""
+        stuck = None
+        for s in range(self.capacity):
+            record = self.records[s]
+            if record is not None and self.end_times[s] == 0 and record[6] < deadline_ns:
+                if stuck is None or record[0] < self.records[stuck][0]:
+                    stuck = s
+        return stuck
+
+    def dump(self, dump_dir=FLIGHT_RECORDER_DUMP_DIR, reason=''):
+        """Write the buffer to <dump_dir>/rank_<rank>.json and return the path."""
+        rank = _get_rank()
+        record = {
+            'rank': rank,
+            'world_size': int(os.environ.get('WORLD_SIZE', '1')),
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'reason': reason,
+            'dump_time_ns': time.time_ns(),
+            'entries': self.entries(),
+        }
+        import mcr_dl.comm as dist
+        if dist.is_initialized():
+            record['world_size'] = dist.get_world_size()
+        os.makedirs(dump_dir, exist_ok=True)
+        path = os.path.join(dump_dir, f'rank_{rank}.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(record, f)
+        os.replace(path + '.tmp', path)
+        return path
+
+    def start_watchdog(self, timeout, dump_dir=FLIGHT_RECORDER_DUMP_DIR, poll_interval=FLIGHT_RECORDER_POLL_INTERVAL):
+        """
+        Start the watchdog thread. An op pending for longer than ``timeout`` (timedelta) is reported once and makes
+        every rank sharing ``dump_dir`` dump its buffer.
+        """
+        if not self.enabled or self._watchdog is not None:
+            return
+        self._stop_event.clear()
+        self._watchdog = threading.Thread(target=self._watchdog_loop,
+                                          args=(int(timeout.total_seconds() * 1e9), dump_dir, poll_interval),
+                                          name='mcr_dl_flight_recorder_watchdog',
+                                          daemon=True)
+        self._watchdog.start()
+
+    def stop_watchdog(self):
+        if self._watchdog is not None:
+            self._stop_event.set()
+            self._watchdog.join()
+            self._watchdog = None
+
+    def _watchdog_loop(self, timeout_ns, dump_dir, poll_interval):
+        from mcr_dl.utils import logger
+
+        trigger = os.path.join(dump_dir, TRIGGER_FILE)
+        # Triggers left over from earlier jobs are ignored
+        last_trigger = time.time()
+        reported_seq = None
+        while not self._stop_event.wait(poll_interval):
+            slot = self.get_stuck_op(time.time_ns() - timeout_ns)
+            stuck = None if slot is None else self.records[slot][0]
+            if stuck is not None and stuck != reported_seq:
+                reported_seq = stuck
+                seq, group_seq, op = self.records[slot][:3]
+                reason = f'{op} (seq {seq}, group seq {group_seq}) pending for more than {timeout_ns / 1e9:.0f}s'
+                os.makedirs(dump_dir, exist_ok=True)
+                with open(trigger, 'w') as f:
+                    f.write(f'rank {_get_rank()}: {reason}\n')
+                path = self.dump(dump_dir, reason=reason)
+                last_trigger = os.path.getmtime(trigger)
+                logger.error(f'Rank {_get_rank()}: {reason}. Flight recorder dumped to {path}, run '
+                             f'"python -m mcr_dl.utils.flight_recorder_diff {dump_dir}" once all ranks have dumped')
+                continue
+            try:
+                mtime = os.path.getmtime(trigger)
+            except OSError:
+                continue
+            if mtime > last_trigger:
+                last_trigger = mtime
+                # This rank's own dump is still current if it is stuck in the op it reported
+                if reported_seq is not None and self.is_pending(reported_seq):
+                    continue
+                with open(trigger, 'r') as f:
+                    self.dump(dump_dir, reason=f'triggered by {f.read().strip()}')
@@ -0,0 +1,73 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+MCR-DL Profiler Ranges
+
+While torch.profiler (or the autograd profiler) is recording, timed_op wraps every MCR-DL op in a record_function
+range named mcr_dl::<log_name>, so native NCCL/MPI collectives show up next to the compute ops and kernels of the
+same trace. When the profiler records shapes (record_shapes=True), the message size, group and the running byte
+count of the op are attached as arguments of the range.
+
+torch.profiler has no public API for custom counter tracks, so the byte counter is carried as the ``bytes_total``
+argument of each range instead. Whether a profiler is recording is a module attribute of torch.autograd.profiler,
+so ops pay a single attribute read when no profiler is running.
+"""
+
+import torch
+import torch.autograd.profiler as autograd_profiler
+
+from mcr_dl.utils.comms_metrics import group_label
+from mcr_dl.utils.dist import tensor_bytes
+
+
+def _supports_keyword_values():
+    # The fast record function takes keyword arguments that end up in the trace since torch 2.4
+    record_function_fast = getattr(torch._C._profiler, '_RecordFunctionFast', None)
+    if record_function_fast is None:
+        return False
+    try:
+        record_function_fast('mcr_dl', [], {})
+    except (TypeError, RuntimeError):
+        return False
+    return True
+
+
+_KEYWORD_VALUES = _supports_keyword_values()
+
+# Bytes moved so far per range name, across all profiling sessions
+bytes_total = {}
+
+
+def profiler_active():
+    return autograd_profiler._is_profiler_enabled
+
+
+def op_range(log_name, tensor, group):
+    """Returns a record_function range for one op, to be entered and exited around the op."""
+    name = 'mcr_dl::' + log_name
+    size = tensor_bytes(tensor)
+    total = bytes_total.get(name, 0) + size
+    bytes_total[name] = total
+    if _KEYWORD_VALUES:
+        return torch._C._profiler._RecordFunctionFast(name, [], {
+            'bytes': size,
+            'bytes_total': total,
+            'group': group_label(group)
+        })
+    return autograd_profiler.record_function(name, f'bytes={size}, bytes_total={total}, group={group_label(group)}')
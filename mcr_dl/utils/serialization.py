@@ -0,0 +1,117 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Pickle protocol 5 serialization with out-of-band buffers for the MCR-DL object collectives.
+
+Large buffers (NumPy arrays and anything else exposing PickleBuffer, as well as torch tensors) are not copied into
+the pickle stream. They are returned as separate flat uint8 tensors that alias the original memory, so they can be
+sent with regular tensor collectives, and only a small header is pickled. Buffers below ``threshold`` bytes stay
+in-band, since a separate transfer would cost more than the copy.
+"""
+
+import io
+import pickle
+import warnings
+
+import torch
+
+# Tag of the persistent ids used for out-of-band torch tensors
+_TENSOR_PID = 'mcr_dl_tensor'
+
+
+def _as_byte_tensor(buffer):
+    # Zero-copy flat uint8 view of a PickleBuffer's memory
+    with warnings.catch_warnings():
+        # Read-only buffers are fine, the sender never writes to them
+        warnings.simplefilter('ignore', UserWarning)
+        return torch.frombuffer(buffer.raw(), dtype=torch.uint8)
+
+
+class _OutOfBandPickler(pickle.Pickler):
+
+    def __init__(self, file, threshold):
+        super().__init__(file, protocol=5, buffer_callback=self._buffer_callback)
+        self.threshold = threshold
+        self.buffers = []
+        # Indices into self.buffers that were produced by buffer_callback (as opposed to tensors)
+        self.pickle_buffer_ids = []
+
+    def _buffer_callback(self, buffer):
+        if buffer.raw().nbytes < self.threshold:
+            # A truthy return value serializes the buffer in-band
+            return True
+        self.pickle_buffer_ids.append(len(self.buffers))
+        self.buffers.append(_as_byte_tensor(buffer))
+        return False
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, torch.Tensor) or type(obj) is not torch.Tensor:
+            return None
+        if obj.is_sparse or obj.element_size() * obj.nelement() < self.threshold:
+            return None
+        data = obj.detach()
+        if not data.is_contiguous():
+            data = data.contiguous()
+        self.buffers.append(data.reshape(-1).view(torch.uint8))
+        return (_TENSOR_PID, len(self.buffers) - 1, obj.dtype, tuple(obj.shape), str(obj.device), obj.requires_grad)
+
+
+class _OutOfBandUnpickler(pickle.Unpickler):
+
+    def __init__(self, file, buffers, pickle_buffer_ids):
+        super().__init__(file, buffers=[self._to_host(buffers[i]) for i in pickle_buffer_ids])
+        self.tensor_buffers = buffers
+
+    @staticmethod
+    def _to_host(buffer):
+        # PickleBuffer consumers (e.g. NumPy) need host memory
+        return buffer.cpu().numpy()
+
+    def persistent_load(self, pid):
+        tag, index, dtype, shape, device, requires_grad = pid
+        if tag != _TENSOR_PID:
+            raise pickle.UnpicklingError(f"unsupported persistent id {tag}")
+        tensor = self.tensor_buffers[index].view(dtype).reshape(shape).to(device)
+        return tensor.requires_grad_(requires_grad)
+
+
+def serialize_object(obj, threshold):
+    """
+    Serialize ``obj`` with pickle protocol 5.
+
+    Returns:
+        header (bytes): pickled (payload, buffer sizes, pickle buffer ids). Its size does not depend on buffer sizes.
+        buffers (list of uint8 tensors): out-of-band buffers, aliasing the memory of the original objects
+    """
+    stream = io.BytesIO()
+    pickler = _OutOfBandPickler(stream, threshold)
+    pickler.dump(obj)
+    sizes = [buffer.numel() for buffer in pickler.buffers]
+    header = pickle.dumps((stream.getvalue(), sizes, pickler.pickle_buffer_ids), protocol=5)
+    return header, pickler.buffers
+
+
+def parse_header(header):
+    """Split a header produced by serialize_object() into (payload, buffer sizes, pickle buffer ids)."""
+    return pickle.loads(header)
+
+
+def deserialize_object(payload, buffers, pickle_buffer_ids):
+    """Rebuild an object from a header payload and its received out-of-band buffers (uint8 tensors)."""
+    return _OutOfBandUnpickler(io.BytesIO(payload), buffers, pickle_buffer_ids).load()
@@ -17,6 +17,7 @@
 # limitations under the License.
 
 import time
+import numpy as np
 from numpy import mean
 from mcr_dl.utils.logging import log_dist
 from mcr_dl.cuda_accelerator import get_accelerator
@@ -149,11 +150,22 @@ class SynchronizedWallClockTimer:
         cache = "cache_allocated: {:.4f} GB".format(get_accelerator().memory_cached() / (1024 * 1024 * 1024))
         max_cache = "max_cache_allocated: {:.4f} GB".format(get_accelerator().max_memory_cached() /
                                                             (1024 * 1024 * 1024))
-        return " | {} | {} | {} | {}".format(alloc, max_alloc, cache, max_cache)
-
-    def log(self, names, normalizer=1.0, reset=True, memory_breakdown=False, ranks=None):
-        """Log a group of timers."""
+        string = " | {} | {} | {} | {}".format(alloc, max_alloc, cache, max_cache)
+        import mcr_dl.comm as dist
+        if dist.comms_memory.enabled:
+            string += " | comm_mem_allocated: {:.4f} GB | max_comm_mem_allocated: {:.4f} GB".format(
+                dist.comms_memory.current / (1024 * 1024 * 1024), dist.comms_memory.peak / (1024 * 1024 * 1024))
+        return string
+
+    def log(self, names, normalizer=1.0, reset=True, memory_breakdown=False, ranks=None, aggregate=False, group=None):
+        """
+        Log a group of timers. With ``aggregate``, the min/max/mean over the ranks of ``group`` and the slowest rank
+        are logged for every timer, which takes a single all-gather and must be called by all ranks of the group with
+        the same ``names``.
+        """
         assert normalizer > 0.0
+        if aggregate:
+            return self._log_aggregate(names, normalizer, reset, ranks, group)
         string = f"time (ms)"
         for name in names:
             if name in self.timers:
@@ -162,6 +174,34 @@ class SynchronizedWallClockTimer:
 
         log_dist(string, ranks=ranks or [0])
 
+    def _log_aggregate(self, names, normalizer, reset, ranks, group):
+        import torch
+        import mcr_dl.comm as dist
+
+        # Timers a rank doesn't have are NaN and left out of its row
+        elapsed = [
+            self.timers[name].elapsed(reset=reset) / normalizer if name in self.timers else float('nan')
+            for name in names
+        ]
+        device = dist.get_comm_device()
+        world_size = dist.get_world_size(group)
+        local = torch.tensor(elapsed, dtype=torch.float64, device=device)
+        gathered = torch.empty(world_size * len(names), dtype=torch.float64, device=device)
+        dist.allgather_fn(gathered, local, group=group)
+        gathered = gathered.view(world_size, len(names)).cpu().numpy()
+        global_ranks = list(range(world_size)) if group is None else dist.get_all_ranks_from_group(group)
+
+        string = f"time (ms) min/max/mean over {world_size} ranks"
+        for i, name in enumerate(names):
+            values = gathered[:, i]
+            if np.isnan(values).all():
+                continue
+            slowest = global_ranks[int(np.nanargmax(values))]
+            string += " | {}: {:.2f}/{:.2f}/{:.2f} (slowest rank {})".format(name, np.nanmin(values),
+                                                                            np.nanmax(values), np.nanmean(values),
+                                                                            slowest)
+        log_dist(string, ranks=ranks or [0])
+
     def get_mean(self, names, normalizer=1.0, reset=True):
         """Get the mean of a group of timers."""
         assert normalizer > 0.0
@@ -209,6 +249,23 @@ class NoopTimer:
 
 
 class ThroughputTimer:
+    """
+    Samples/sec of training steps, logged every ``steps_per_output`` global steps.
+
+    By default every start() and stop() synchronizes the device so that host timestamps measure the step. With
+    ``use_events``, start() and stop() only record an event on the current stream (a host timestamp on devices that
+    run ops synchronously) and the events are resolved at the next ``steps_per_output`` boundary, so the timer never
+    stalls the pipeline in between.
+
+    Arguments:
+        batch_size: samples per global step
+        tokens_per_sample: Optional (int). Adds tokens/sec to the report.
+        flops_per_sample: Optional (float). Model FLOPs of forward and backward of one sample, adds the achieved
+            TFLOPS and, with ``peak_flops``, the model FLOPs utilization (MFU) to the report.
+        peak_flops: Optional (float). Peak FLOPS of a single device.
+        num_devices: Optional (int). Devices the batch is spread over, defaults to the world size.
+        ewma_alpha: Optional (float). Smoothing factor of the step time EWMA.
+    """
 
     def __init__(
         self,
@@ -217,6 +274,12 @@ class ThroughputTimer:
         steps_per_output=50,
         monitor_memory=False,
         logging_fn=None,
+        use_events=False,
+        tokens_per_sample=None,
+        flops_per_sample=None,
+        peak_flops=None,
+        num_devices=None,
+        ewma_alpha=0.1,
     ):
         from mcr_dl.utils import logger
         self.start_time = 0
@@ -229,6 +292,8 @@ class ThroughputTimer:
         self.global_step_count = 0
         self.total_elapsed_time = 0
         self.step_elapsed_time = 0
+        self.last_step_time = 0
+        self.step_time_ewma = None
         self.steps_per_output = steps_per_output
         self.monitor_memory = monitor_memory
         self.logging = logging_fn
@@ -236,6 +301,18 @@ class ThroughputTimer:
             self.logging = logger.info
         self.initialized = False
 
+        self.use_events = use_events
+        self.tokens_per_sample = tokens_per_sample
+        self.flops_per_sample = flops_per_sample
+        self.peak_flops = peak_flops
+        self.num_devices = num_devices
+        self.ewma_alpha = ewma_alpha
+        self._host_markers = get_accelerator().is_synchronized_device()
+        self._start_marker = None
+        # (start marker, end marker, ends a global step) of the micro steps timed since the last resolve
+        self._pending = []
+        self._event_pool = []
+
         if self.monitor_memory and not PSUTILS_INSTALLED:
             raise ImportError("Unable to import 'psutils', please install package")
 
@@ -246,12 +323,22 @@ class ThroughputTimer:
     def _init_timer(self):
         self.initialized = True
 
+    def _marker(self):
+        if self._host_markers:
+            return time.perf_counter()
+        event = self._event_pool.pop() if self._event_pool else get_accelerator().Event(enable_timing=True)
+        event.record()
+        return event
+
     def start(self):
         self._init_timer()
         self.started = True
         if self.global_step_count >= self.start_step:
-            get_accelerator().synchronize()
-            self.start_time = time.time()
+            if self.use_events:
+                self._start_marker = self._marker()
+            else:
+                get_accelerator().synchronize()
+                self.start_time = time.time()
 
     def stop(self, global_step=False, report_speed=True):
         if not self.started:
@@ -260,6 +347,17 @@ class ThroughputTimer:
         self.micro_step_count += 1
         if global_step:
             self.global_step_count += 1
+        report = global_step and self.global_step_count % self.steps_per_output == 0
+
+        if self.use_events:
+            if self._start_marker is not None:
+                self._pending.append((self._start_marker, self._marker(), global_step))
+                self._start_marker = None
+            if report:
+                self._resolve()
+                if report_speed and self.last_step_time > 0:
+                    self._report()
+            return
 
         if self.start_time > 0:
             get_accelerator().synchronize()
@@ -269,38 +367,88 @@ class ThroughputTimer:
             self.step_elapsed_time += duration
 
             if global_step:
-                if report_speed and self.global_step_count % self.steps_per_output == 0:
-                    self.logging(
-                        "epoch={}/micro_step={}/global_step={}, RunningAvgSamplesPerSec={}, CurrSamplesPerSec={}, "
-                        "MemAllocated={}GB, MaxMemAllocated={}GB".format(
-                            self.epoch_count,
-                            self.micro_step_count,
-                            self.global_step_count,
-                            self.avg_samples_per_sec(),
-                            self.batch_size / self.step_elapsed_time,
-                            round(get_accelerator().memory_allocated() / 1024**3, 2),
-                            round(get_accelerator().max_memory_allocated() / 1024**3, 2),
-                        ))
-                    if self.monitor_memory:
-                        virt_mem = psutil.virtual_memory()
-                        swap = psutil.swap_memory()
-                        self.logging("epoch={}/micro_step={}/global_step={}, vm %: {}, swap %: {}".format(
-                            self.epoch_count,
-                            self.micro_step_count,
-                            self.global_step_count,
-                            virt_mem.percent,
-                            swap.percent,
-                        ))
-                self.step_elapsed_time = 0
+                self._end_global_step()
+                if report_speed and report:
+                    self._report()
+
+    def _end_global_step(self):
+        self.last_step_time = self.step_elapsed_time
+        if self.step_time_ewma is None:
+            self.step_time_ewma = self.last_step_time
+        else:
+            self.step_time_ewma += self.ewma_alpha * (self.last_step_time - self.step_time_ewma)
+        self.step_elapsed_time = 0
+
+    def _resolve(self):
+        # Waiting on the last end event covers all earlier ones, they were recorded on the same stream
+        if not self._pending:
+            return
+        if not self._host_markers:
+            self._pending[-1][1].synchronize()
+        for start, end, global_step in self._pending:
+            if self._host_markers:
+                duration = end - start
+            else:
+                duration = start.elapsed_time(end) / 1000.0
+                self._event_pool.extend((start, end))
+            self.total_elapsed_time += duration
+            self.step_elapsed_time += duration
+            if global_step:
+                self._end_global_step()
+        self._pending.clear()
+
+    def _report(self):
+        samples_per_sec = self.batch_size / self.last_step_time
+        stats = [
+            f"RunningAvgSamplesPerSec={self.avg_samples_per_sec()}",
+            f"CurrSamplesPerSec={samples_per_sec}",
+            f"StepTimeEWMA={self.step_time_ewma:.4f}s",
+        ]
+        if self.tokens_per_sample is not None:
+            stats.append(f"CurrTokensPerSec={samples_per_sec * self.tokens_per_sample}")
+        if self.flops_per_sample is not None:
+            stats.append(f"CurrTFLOPS={self.achieved_flops(samples_per_sec) / 1e12:.2f}")
+            if self.peak_flops:
+                stats.append(f"MFU={self.mfu(samples_per_sec):.4f}")
+        stats.append(f"MemAllocated={round(get_accelerator().memory_allocated() / 1024**3, 2)}GB")
+        stats.append(f"MaxMemAllocated={round(get_accelerator().max_memory_allocated() / 1024**3, 2)}GB")
+        step = f"epoch={self.epoch_count}/micro_step={self.micro_step_count}/global_step={self.global_step_count}"
+        self.logging(f"{step}, " + ", ".join(stats))
+        if self.monitor_memory:
+            virt_mem = psutil.virtual_memory()
+            swap = psutil.swap_memory()
+            self.logging(f"{step}, vm %: {virt_mem.percent}, swap %: {swap.percent}")
+
+    def _num_devices(self):
+        if self.num_devices is None:
+            import mcr_dl.comm as dist
+            self.num_devices = dist.get_world_size() if dist.is_initialized() else 1
+        return self.num_devices
 
     def avg_samples_per_sec(self):
-        if self.global_step_count > 0:
+        # Resolves the pending events, which waits for the device when called between reports
+        if self.use_events:
+            self._resolve()
+        if self.global_step_count > 0 and self.total_elapsed_time > 0:
             total_step_offset = self.global_step_count - self.start_step
             avg_time_per_step = self.total_elapsed_time / total_step_offset
             # training samples per second
             return self.batch_size / avg_time_per_step
         return float("-inf")
 
+    def avg_tokens_per_sec(self):
+        return self.avg_samples_per_sec() * self.tokens_per_sample
+
+    def achieved_flops(self, samples_per_sec=None):
+        """Model FLOPS of one device, at ``samples_per_sec`` or the running average."""
+        if samples_per_sec is None:
+            samples_per_sec = self.avg_samples_per_sec()
+        return samples_per_sec * self.flops_per_sample / self._num_devices()
+
+    def mfu(self, samples_per_sec=None):
+        """Model FLOPs utilization, the achieved model FLOPS as a fraction of the peak FLOPS of the devices."""
+        return self.achieved_flops(samples_per_sec) / self.peak_flops
+
 
 def trim_mean(data, trim_percent):
     """Compute the trimmed mean of a list of numbers.
@@ -16,6 +16,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import pytest
 from pytest import fixture
 
 
@@ -29,3 +30,14 @@ def pytest_addoption(parser):
         action="store"
     )
 
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_call(item):
+    # Tests that run inside an externally launched job (mpirun/torchrun with --dist/--backend) are executed in
+    # place. Otherwise DistributedTest classes launch their own processes with the class' world_size/backend.
+    import mcr_dl as dist
+    if getattr(item.cls, "is_dist_test", False) and not dist.is_initialized():
+        dist_test_class = item.cls()
+        dist_test_class(item._request)
+        item.runtest = lambda: True  # Dummy function so test is not run twice
@@ -0,0 +1,69 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import time
+
+import torch
+
+import mcr_dl as dist
+from mcr_dl.utils.comms_anomaly import AnomalyDetector
+from .common import DistributedTest
+
+
+def test_slow_op():
+    detector = AnomalyDetector(k=5, warmup=20, check_interval=0)
+    reports = []
+    detector.add_callback(reports.append)
+    rng = random.Random(0)
+    for _ in range(200):
+        assert not detector.observe('all_reduce', None, 4096, 1.0 + rng.uniform(-0.05, 0.05))
+    baseline, mad = detector.get_baseline('all_reduce', 4096)
+    assert abs(baseline - 1.0) < 0.02 and 0 < mad < 0.05
+
+    # A degraded link: the slow ops are flagged and barely move the baseline
+    for _ in range(5):
+        assert detector.observe('all_reduce', None, 4096, 10.0)
+    assert detector.get_baseline('all_reduce', 4096)[0] < 1.2
+    assert [r['type'] for r in reports] == ['slow_op'] * 5
+    assert reports[0]['latency_ms'] == 10.0 and reports[0]['group'] == 'world'
+    # Other size buckets have baselines of their own
+    assert detector.get_baseline('all_reduce', 1 << 20) is None
+
+
+class TestSlowRank(DistributedTest):
+    world_size = 2
+    backend = 'gloo'
+    requires_cuda_env = False
+    reuse_dist_env = True
+
+    def test_slow_rank(self):
+        reports = []
+        detector = dist.start_anomaly_detection(check_interval=2, callback=reports.append)
+        dist.configure(prof_all=True)
+        tensor = torch.ones(16)
+        for step in range(1, 7):
+            # Rank 1 is late to every collective, so rank 0 spends its time waiting in them
+            if dist.get_rank() == 1:
+                time.sleep(0.02)
+            dist.all_reduce(tensor)
+            dist.set_comms_step(step)
+        dist.stop_anomaly_detection()
+        dist.configure(enabled=False)
+        assert detector.slow_rank == 1 and detector.slow_checks == 3
+        assert [r['rank'] for r in reports if r['type'] == 'slow_rank'] == [1]
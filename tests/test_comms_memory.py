@@ -0,0 +1,83 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gc
+
+import numpy as np
+import torch
+
+import mcr_dl.comm as dist
+from mcr_dl.utils.comms_memory import CommsMemory
+
+from .common import DistributedTest
+
+MB = 1024 * 1024
+
+
+def test_chunk_numel():
+    memory = CommsMemory(budget=8 * MB)
+    assert memory.chunk_numel(4 * MB, 1024) == 1024
+    memory.allocate('all_reduce', None, 4 * MB)
+    # 4 MB are left, an op needing 2 bytes of scratch per element can run 2M elements at a time
+    assert memory.chunk_numel(16 * MB, 8 * MB) == 2 * MB
+    # Chunks don't get smaller than COMMS_MEMORY_MIN_CHUNK_BYTES
+    memory.allocate('all_reduce', None, 4 * MB)
+    assert memory.chunk_numel(16 * MB, 8 * MB) == MB // 2
+    memory.release('all_reduce', None, 8 * MB)
+    assert memory.current == 0 and memory.peak == 8 * MB
+
+
+class TestCommsMemory(DistributedTest):
+    world_size = 2
+    backend = 'gloo'
+    requires_cuda_env = False
+    reuse_dist_env = True
+
+    def test_budget(self, monkeypatch):
+        # Pretend the backend allocates a receive buffer like the tensor, as the MPI backend does
+        monkeypatch.setattr(dist.cdb, 'scratch_bytes', lambda op_name, tensor, group=None: tensor.numel() * 4,
+                            raising=False)
+        calls = []
+        all_reduce = dist.cdb.all_reduce
+        monkeypatch.setattr(dist.cdb, 'all_reduce', lambda tensor, *args: calls.append(tensor.numel()) or
+                            all_reduce(tensor, *args))
+        monkeypatch.setattr(dist, 'comms_memory', CommsMemory())
+        dist.configure(memory_budget=3 * MB)
+
+        tensor = torch.arange(MB, dtype=torch.float32).view(1024, 1024)
+        dist.all_reduce(tensor)
+        assert torch.equal(tensor, torch.arange(MB, dtype=torch.float32).view(1024, 1024) * 2)
+        assert calls == [3 * MB // 4, MB // 4]
+        assert dist.comms_memory.chunked_ops == 1
+        assert dist.comms_memory.peak == 3 * MB and dist.comms_memory.current == 0
+
+        # Fits the budget, runs in one go
+        dist.all_reduce(torch.ones(1024))
+        assert calls[-1] == 1024 and dist.comms_memory.chunked_ops == 1
+
+    def test_object_buffers(self, monkeypatch):
+        monkeypatch.setattr(dist, 'comms_memory', CommsMemory())
+        dist.configure(memory_accounting=True)
+        objects = []
+        dist.all_gather_object(objects, np.ones(MB // 8, dtype=np.float64))
+        # The receive buffer of the other rank's array
+        assert dist.comms_memory.peak == MB
+        del objects
+        gc.collect()
+        assert dist.comms_memory.current == 0
+        assert any('all_gather_object' in line for line in dist.comms_memory.summary())
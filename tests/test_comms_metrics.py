@@ -0,0 +1,58 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import urllib.request
+
+from mcr_dl.utils.comms_metrics import CommsMetrics, MetricsExporter
+
+
+def test_metrics_exporter():
+    metrics = CommsMetrics(buckets=[0.001, 0.01])
+
+    def record_ops():
+        for i in range(5):
+            metrics.record('all_reduce', None, 1024, 0.005, 2.0)
+        metrics.record('broadcast', None, 512, 0.5, 1.0)
+
+    threads = [threading.Thread(target=record_ops) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Every recording thread owns a shard
+    assert len(metrics._shards) == 2
+
+    exporter = MetricsExporter(metrics, 0, port=0)
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{exporter.port}/metrics') as response:
+            body = response.read().decode('utf-8')
+    finally:
+        exporter.stop()
+
+    labels = 'rank="0",op="all_reduce",group="world"'
+    assert f'mcr_dl_comm_ops_total{{{labels}}} 10' in body
+    assert f'mcr_dl_comm_bytes_total{{{labels}}} 10240' in body
+    assert f'mcr_dl_comm_latency_seconds_bucket{{{labels},le="0.001"}} 0' in body
+    assert f'mcr_dl_comm_latency_seconds_bucket{{{labels},le="0.01"}} 10' in body
+    assert f'mcr_dl_comm_latency_seconds_bucket{{{labels},le="+Inf"}} 10' in body
+    assert f'mcr_dl_comm_busbw_gbps{{{labels}}} 2.0' in body
+    broadcast = 'rank="0",op="broadcast",group="world"'
+    assert f'mcr_dl_comm_latency_seconds_bucket{{{broadcast},le="0.01"}} 0' in body
+    assert f'mcr_dl_comm_latency_seconds_bucket{{{broadcast},le="+Inf"}} 2' in body
+    assert '# TYPE mcr_dl_comm_latency_seconds histogram' in body
@@ -0,0 +1,46 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import torch
+
+from mcr_dl.utils.comms_logging import CommsLogger
+
+
+def test_call_sampling():
+    logger = CommsLogger()
+    logger.sample_rate = 4
+    small, large = torch.ones(16), torch.ones(4096)
+    weights = [logger.sample_weight('all_reduce', small) for _ in range(8)]
+    assert weights == [4, 0, 0, 0, 4, 0, 0, 0]
+    # Other message size buckets and ops are counted separately
+    assert logger.sample_weight('all_reduce', large) == 4
+    assert logger.sample_weight('broadcast', small) == 4
+    # Decisions only depend on the call sequence, so a second logger (another rank) samples the same calls
+    other = CommsLogger()
+    other.sample_rate = 4
+    assert [other.sample_weight('all_reduce', small) for _ in range(8)] == weights
+
+
+def test_step_sampling():
+    logger = CommsLogger()
+    logger.sample_steps = 10
+    weights = []
+    for step in range(20):
+        logger.step = step
+        weights.append(logger.sample_weight('all_reduce', None))
+    assert weights == [10] + [0] * 9 + [10] + [0] * 9
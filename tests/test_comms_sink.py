@@ -0,0 +1,62 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import time
+
+from mcr_dl.utils.comms_sink import CommsSink, load_comms_log
+
+
+def test_jsonl_sink_rotation(tmp_path, monkeypatch):
+    monkeypatch.setenv('RANK', '1')
+    # Tiny segments and batches, so the log is spread over several files
+    sink = CommsSink(str(tmp_path), format='jsonl', max_bytes=512, flush_records=4, flush_interval=0.01)
+    sink.start()
+    for i in range(20):
+        sink.step = i // 5
+        sink.record('all_reduce', None, 1024 * i, 0.5, 2.0, 1.0)
+        # Segments are only rotated between batches, so let the writer drain each one
+        while sink._pending:
+            time.sleep(0.01)
+    sink.stop()
+    assert len(os.listdir(tmp_path)) > 1
+
+    log = load_comms_log(str(tmp_path))
+    assert len(log) == 20
+    assert (log['rank'] == 1).all() and (log['count'] == 1).all()
+    assert log['size'].tolist() == [1024 * i for i in range(20)]
+    assert log['step'].tolist() == [i // 5 for i in range(20)]
+    assert log['op'][0] == 'all_reduce' and log['group'][0] == 'world'
+
+
+def test_csv_gzip_interval_sink(tmp_path, monkeypatch):
+    monkeypatch.setenv('RANK', '0')
+    sink = CommsSink(str(tmp_path), format='csv', interval=60, compress=True)
+    sink.start()
+    for i in range(10):
+        sink.record('broadcast', None, 4096, float(i), 1.0, 1.0)
+        sink.record('all_gather', None, 256, 1.0, 3.0, 2.0)
+    sink.stop()
+    assert os.listdir(tmp_path) == ['comms_rank0-00000.csv.gz']
+
+    # All ops fall into one interval, so there is one averaged record per (op, group, size)
+    log = load_comms_log(str(tmp_path))
+    assert log['op'].tolist() == ['all_gather', 'broadcast']
+    assert log['count'].tolist() == [10, 10]
+    assert log['latency_ms'].tolist() == [1.0, 4.5]
+    assert log['busbw_gbps'].tolist() == [2.0, 1.0]
@@ -0,0 +1,52 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+from mcr_dl.utils.comms_tracing import CommsTracer
+from mcr_dl.utils.comms_trace_merge import load_traces, merge_traces
+
+
+def test_trace_export_and_merge(tmp_path, monkeypatch):
+    monkeypatch.setenv('WORLD_SIZE', '2')
+    for rank, offset_us in [(0, 0), (1, 500)]:
+        monkeypatch.setenv('RANK', str(rank))
+        # Small buffers, so events are handed to the writer thread several times
+        tracer = CommsTracer(buffer_size=4)
+        tracer.start(str(tmp_path), sync_clocks=False)
+        tracer._clock_sync.append((1000 * 1000 + offset_us * 1000, offset_us * 1000))
+        for i in range(10):
+            begin = (1000 + offset_us + 100 * i) * 1000
+            tracer.record('all_reduce' if i % 2 == 0 else 'broadcast', None, 1024 * i, begin, begin + 50 * 1000)
+            # Let the writer return the spare buffer, otherwise events recorded while both buffers are full are dropped
+            tracer._queue.join()
+        path = tracer.export(sync_clocks=False)
+        tracer.stop()
+        with open(path) as f:
+            events = [e for e in json.load(f)['traceEvents'] if e['ph'] == 'X']
+        assert len(events) == 10 and tracer.dropped == 0
+        assert [e['args']['bytes'] for e in events] == [1024 * i for i in range(10)]
+        assert events[1]['name'] == 'broadcast' and events[1]['dur'] == 50
+
+    merged = merge_traces(load_traces(str(tmp_path)))
+    events = [e for e in merged['traceEvents'] if e['ph'] == 'X']
+    starts = {}
+    for e in events:
+        starts.setdefault(e['pid'], []).append(e['ts'])
+    # After the clock correction both ranks' events line up on a timeline starting at 0
+    assert starts[0] == starts[1] == [100 * i for i in range(10)]
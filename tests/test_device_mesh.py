@@ -0,0 +1,59 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import torch
+
+import mcr_dl as dist
+from .common import DistributedTest
+
+
+class TestDeviceMesh(DistributedTest):
+    world_size = 8
+    backend = 'gloo'
+    requires_cuda_env = False
+    reuse_dist_env = True
+
+    def test_groups(self):
+        mesh = dist.DeviceMesh((2, 2, 2), dim_names=('pp', 'dp', 'tp'))
+        rank = dist.get_rank()
+        assert mesh.get_rank(mesh.get_coordinate()) == rank
+        for dim in mesh.dim_names:
+            ranks = mesh.get_group_ranks(dim)
+            assert rank in ranks
+            assert len(ranks) == mesh.get_dim_size(dim)
+            assert ranks.index(rank) == mesh.get_local_rank(dim)
+            x = torch.tensor([float(rank)])
+            dist.all_reduce(x, group=mesh.get_group(dim))
+            assert x.item() == sum(ranks)
+
+    def test_coordinates(self):
+        mesh = dist.DeviceMesh((2, 4), dim_names=('dp', 'tp'))
+        assert mesh.get_coordinate(5) == (1, 1)
+        assert mesh.get_rank((1, 3)) == 7
+        assert mesh.get_group_ranks('tp') == [4 * (dist.get_rank() // 4) + i for i in range(4)]
+        assert mesh.get_group_ranks('dp') == [dist.get_rank() % 4, dist.get_rank() % 4 + 4]
+
+    def test_group_cache(self):
+        mesh_a = dist.DeviceMesh((4, 2), dim_names=('dp', 'tp'))
+        mesh_b = dist.DeviceMesh((2, 2, 2), dim_names=('pp', 'dp', 'tp'))
+        assert mesh_a.get_group('tp') is mesh_b.get_group('tp')
+
+    def test_invalid_shape(self):
+        with pytest.raises(ValueError):
+            dist.DeviceMesh((3, 2))
@@ -0,0 +1,70 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import torch
+
+from mcr_dl.utils.flight_recording import FlightRecorder
+from mcr_dl.utils.flight_recorder_diff import load_dumps, diff_dumps
+
+
+def record_ops(recorder, ops):
+    for op, tensor, done in ops:
+        seq = recorder.start(op, None, tensor)
+        if done:
+            recorder.end(seq)
+
+
+def test_ring_buffer():
+    recorder = FlightRecorder(capacity=6)
+    assert recorder.capacity == 8
+    tensor = torch.ones(4, 2, dtype=torch.float16)
+    record_ops(recorder, [('all_reduce', tensor, True)] * 10)
+    seq = recorder.start('broadcast', None, [tensor])
+    recorder.fail(seq)
+    recorder.end(seq)
+    record_ops(recorder, [('barrier', None, False)])
+
+    entries = recorder.entries()
+    assert [e['seq'] for e in entries] == list(range(4, 12))
+    assert [e['group_seq'] for e in entries] == list(range(4, 12))
+    assert entries[0] == dict(entries[0], op='all_reduce', group='world', shape=[4, 2], dtype='torch.float16',
+                              state='done')
+    assert entries[-2]['state'] == 'failed' and entries[-2]['end_time_ns'] > 0
+    assert entries[-1]['state'] == 'pending' and entries[-1]['shape'] is None
+    assert recorder.get_stuck_op(entries[-1]['start_time_ns']) is None
+    assert recorder.get_stuck_op(entries[-1]['start_time_ns'] + 1) == 11 & recorder.mask
+
+
+def test_diff_dumps(tmp_path, monkeypatch):
+    tensor = torch.ones(8)
+    for rank in range(3):
+        monkeypatch.setenv('RANK', str(rank))
+        monkeypatch.setenv('WORLD_SIZE', '4')
+        recorder = FlightRecorder()
+        # Rank 1 issues a different collective at group seq 1, rank 2 never reaches group seq 2
+        ops = [('all_reduce', tensor, True), ('all_gather' if rank == 1 else 'all_reduce', tensor, True)]
+        if rank != 2:
+            ops.append(('all_reduce', tensor, False))
+        record_ops(recorder, ops)
+        recorder.dump(str(tmp_path))
+
+    findings = diff_dumps(load_dumps(str(tmp_path)))
+    assert any(f.startswith('no dump from ranks [3]') for f in findings)
+    assert any('rank 2 stopped at group seq 1' in f for f in findings)
+    assert any('rank 0 is stuck in group seq 2' in f for f in findings)
+    assert any('mismatched collective at group seq 1' in f for f in findings)
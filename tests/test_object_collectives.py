@@ -0,0 +1,71 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import torch
+
+import mcr_dl as dist
+from mcr_dl.constants import OBJECT_OOB_THRESHOLD
+from mcr_dl.utils.serialization import serialize_object, parse_header, deserialize_object
+from .common import DistributedTest
+
+
+def test_out_of_band_serialization():
+    large = np.arange(OBJECT_OOB_THRESHOLD, dtype=np.float32)
+    tensor = torch.randn(256, 512, dtype=torch.bfloat16)[:, ::2]
+    obj = {'large': large, 'tensor': tensor, 'small': np.ones(4), 'name': 'mcr_dl'}
+    header, buffers = serialize_object(obj, OBJECT_OOB_THRESHOLD)
+    # Only the large array and the tensor travel out-of-band, and the array is not copied
+    assert len(buffers) == 2
+    assert buffers[0].data_ptr() == large.ctypes.data
+    assert len(header) < OBJECT_OOB_THRESHOLD
+
+    payload, sizes, pickle_buffer_ids = parse_header(header)
+    assert sizes == [b.numel() for b in buffers]
+    result = deserialize_object(payload, [b.clone() for b in buffers], pickle_buffer_ids)
+    assert np.array_equal(result['large'], large)
+    assert torch.equal(result['tensor'], tensor)
+    assert np.array_equal(result['small'], obj['small'])
+    assert result['name'] == 'mcr_dl'
+
+
+class TestObjectCollectives(DistributedTest):
+    world_size = 4
+    backend = 'gloo'
+    requires_cuda_env = False
+    reuse_dist_env = True
+
+    def test_broadcast_object_list(self):
+        rank = dist.get_rank()
+        objects = [{'array': np.arange(100000), 'tensor': torch.ones(50000)}, 'mcr_dl'] if rank == 1 else [None, None]
+        dist.broadcast_object_list(objects, src=1)
+        assert np.array_equal(objects[0]['array'], np.arange(100000))
+        assert torch.equal(objects[0]['tensor'], torch.ones(50000))
+        assert objects[1] == 'mcr_dl'
+
+    def test_all_gather_object(self):
+        rank = dist.get_rank()
+        # Ranks contribute different numbers of out-of-band buffers
+        obj = {'rank': rank, 'arrays': [np.full(50000, rank) for _ in range(rank)]}
+        output = []
+        dist.all_gather_object(output, obj)
+        assert len(output) == dist.get_world_size()
+        for r, o in enumerate(output):
+            assert o['rank'] == r
+            assert len(o['arrays']) == r
+            assert all((a == r).all() for a in o['arrays'])
@@ -0,0 +1,67 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import torch
+from torch.profiler import profile
+
+import mcr_dl as dist
+from mcr_dl.utils import profiler_ranges
+from .common import DistributedTest
+
+
+class TestProfilerRanges(DistributedTest):
+    world_size = 2
+    backend = 'gloo'
+    requires_cuda_env = False
+    reuse_dist_env = True
+
+    def test_ranges(self):
+        tensor = torch.ones(256)
+        with profile() as prof:
+            dist.all_reduce(tensor)
+            dist.all_reduce(tensor, log_name='grad_all_reduce')
+            dist.broadcast(tensor, 0)
+        names = [event.name for event in prof.events() if event.name.startswith('mcr_dl::')]
+        assert names == ['mcr_dl::all_reduce', 'mcr_dl::grad_all_reduce', 'mcr_dl::broadcast']
+
+        # No ranges are opened while no profiler is recording, or when they are turned off
+        dist.all_reduce(tensor)
+        dist.configure(profiler_ranges=False)
+        with profile() as prof:
+            dist.all_reduce(tensor)
+        dist.configure(profiler_ranges=True)
+        assert not [event for event in prof.events() if event.name.startswith('mcr_dl::')]
+
+    def test_range_args(self, tmp_path):
+        tensor = torch.ones(256)
+        # Range arguments are only recorded along with input shapes
+        with profile(record_shapes=True) as prof:
+            dist.all_reduce(tensor, log_name='args_all_reduce')
+            dist.all_reduce(tensor, log_name='args_all_reduce')
+        path = str(tmp_path / 'trace.json')
+        prof.export_chrome_trace(path)
+        with open(path) as f:
+            events = [e for e in json.load(f)['traceEvents'] if e.get('name') == 'mcr_dl::args_all_reduce']
+        assert len(events) == 2
+        # Older torch versions can't attach arguments to ranges
+        if profiler_ranges._KEYWORD_VALUES:
+            assert [e['args']['bytes'] for e in events] == [1024, 1024]
+            assert [e['args']['bytes_total'] for e in events] == [1024, 2048]
+            assert events[0]['args']['group'] == 'world'
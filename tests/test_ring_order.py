@@ -0,0 +1,89 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+
+import numpy as np
+import torch
+
+import mcr_dl as dist
+from mcr_dl.ring_order import bottleneck_ring, ring_bottleneck, ring_hops
+from .common import DistributedTest
+
+
+def synthetic_bandwidth(num_ranks, num_nodes, intra=100.0, inter=10.0):
+    # Ranks placed round-robin over the nodes, so consecutive ranks are always on different nodes
+    nodes = np.arange(num_ranks) % num_nodes
+    bw = np.where(nodes[:, None] == nodes[None, :], intra, inter)
+    np.fill_diagonal(bw, np.nan)
+    return bw
+
+
+def test_round_robin_placement():
+    bw = synthetic_bandwidth(16, 4)
+    # A degraded cross-node link, which the ring must avoid
+    bw[0, 1] = bw[1, 0] = 1.0
+    identity = list(range(16))
+    assert ring_bottleneck(identity, bw) == 1.0
+    order = bottleneck_ring(bw)
+    assert sorted(order) == identity and order[0] == 0
+    assert ring_bottleneck(order, bw) == 10.0
+    # Only one hop into and one hop out of every node
+    assert (ring_hops(order, np.nan_to_num(bw)) == 10.0).sum() == 4
+
+
+def test_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        bw = rng.uniform(1, 100, size=(7, 7))
+        best = max(ring_bottleneck((0, ) + perm, bw) for perm in itertools.permutations(range(1, 7)))
+        assert ring_bottleneck(bottleneck_ring(bw), bw) == best
+
+
+class TestRingCollectives(DistributedTest):
+    world_size = 4
+    backend = 'gloo'
+    requires_cuda_env = False
+    reuse_dist_env = True
+
+    def test_ring_collectives(self):
+        # Links 0-1 and 2-3 are slow, so the ring is 0-2-1-3 or 0-3-1-2
+        bw = np.full((4, 4), 10.0)
+        bw[0, 1] = bw[1, 0] = bw[2, 3] = bw[3, 2] = 1.0
+        ring = dist.use_ring_order(bandwidth=bw)
+        assert ring.order in ([0, 2, 1, 3], [0, 3, 1, 2])
+        rank = dist.get_rank()
+        try:
+            # Not a multiple of the world size, so the all_reduce pads its chunks
+            tensor = torch.arange(10, dtype=torch.float32) * (rank + 1)
+            dist.all_reduce(tensor)
+            assert torch.equal(tensor, torch.arange(10, dtype=torch.float32) * 10)
+
+            tensor = torch.full((3, ), float(rank))
+            dist.all_reduce(tensor, op=dist.ReduceOp.MAX)
+            assert torch.equal(tensor, torch.full((3, ), 3.0))
+
+            output = torch.empty(8)
+            dist.all_gather_into_tensor(output, torch.full((2, ), float(rank)))
+            assert torch.equal(output, torch.tensor([0., 0., 1., 1., 2., 2., 3., 3.]))
+
+            output = torch.empty(2)
+            dist.reduce_scatter_tensor(output, torch.arange(8, dtype=torch.float32) + rank, op=dist.ReduceOp.AVG)
+            assert torch.equal(output, torch.arange(2 * rank, 2 * rank + 2, dtype=torch.float32) + 1.5)
+        finally:
+            dist.clear_ring_order()
@@ -0,0 +1,58 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+import pytest
+
+from mcr_dl.utils.timer import ThroughputTimer
+
+
+def run_steps(timer, steps, step_time):
+    for _ in range(steps):
+        timer.start()
+        time.sleep(step_time)
+        timer.stop(global_step=True)
+
+
+@pytest.mark.parametrize('use_events', [False, True])
+def test_report(use_events):
+    logs = []
+    timer = ThroughputTimer(batch_size=8,
+                            start_step=2,
+                            steps_per_output=4,
+                            logging_fn=logs.append,
+                            use_events=use_events,
+                            tokens_per_sample=512,
+                            flops_per_sample=1e9,
+                            peak_flops=1e12,
+                            num_devices=2)
+    run_steps(timer, 7, 0.02)
+    # Steps 3 and 4 are timed, the report comes at step 4
+    assert len(logs) == 1
+    for field in ('CurrSamplesPerSec', 'StepTimeEWMA', 'CurrTokensPerSec', 'CurrTFLOPS', 'MFU', 'MemAllocated'):
+        assert field in logs[0]
+    if use_events:
+        # Steps 5 to 7 stay pending until the next boundary or until a getter needs them
+        assert len(timer._pending) == 3
+    samples_per_sec = timer.avg_samples_per_sec()
+    assert timer._pending == []
+    assert 8 / 0.04 < samples_per_sec <= 8 / 0.02
+    assert 0.02 <= timer.step_time_ewma < 0.04
+    assert timer.avg_tokens_per_sec() == pytest.approx(samples_per_sec * 512)
+    assert timer.mfu() == pytest.approx(samples_per_sec * 1e9 / 2 / 1e12)
@@ -0,0 +1,45 @@
+# Copyright 2023, The Ohio State University. All rights reserved.
+# The MVAPICH software package is developed by the team members of
+# The Ohio State University's Network-Based Computing Laboratory (NBCL),
+# headed by Professor Dhabaleswar K. (DK) Panda.
+#
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mcr_dl
+import mcr_dl.utils.timer as timer_module
+from mcr_dl.utils.timer import SynchronizedWallClockTimer
+
+from .common import DistributedTest
+
+
+class TestAggregateLog(DistributedTest):
+    world_size = 3
+    backend = 'gloo'
+    requires_cuda_env = False
+    reuse_dist_env = True
+
+    def test_aggregate(self, monkeypatch):
+        messages = []
+        monkeypatch.setattr(timer_module, 'log_dist', lambda message, ranks=None: messages.append(message))
+        rank = mcr_dl.get_rank()
+        timers = SynchronizedWallClockTimer()
+        # Rank 1 is the slowest on 'fwd', 'bwd' only exists on rank 0
+        timers('fwd').event_timers.append(0.01 * (2 if rank == 1 else 1))
+        if rank == 0:
+            timers('bwd').event_timers.append(0.005)
+        timers.log(['fwd', 'bwd', 'step'], aggregate=True)
+        assert messages == [
+            "time (ms) min/max/mean over 3 ranks | fwd: 10.00/20.00/13.33 (slowest rank 1) | "
+            "bwd: 5.00/5.00/5.00 (slowest rank 0)"
+        ]